@@ -0,0 +1,9 @@
+# This package MUST be used with python 2.x
+#
+# The artifactory cleaner; one engine (crawl, catalogs, delete) shared by every repo we clean, and a policy for each
+# kind of repo that decides what in it can be deleted. See README.md
+#
+#   engine      crawling/listing/scanning a repo into a catalog, checkpoints, incremental crawls, the list files,
+#               verifying and deleting (and the options all of that takes)
+#   policies    one module per kind of repo (npm, snapshots); see policies/__init__.py for what a policy provides
+#   cli         the command line (and Jenkins env-var) options, and the run of one or more policies
@@ -0,0 +1,7 @@
+# This module MUST be used with python 2.x
+#
+# python -m artifactory_cleaner -a npm,snapshots -u <user> -p <password> [options]
+
+from artifactory_cleaner import cli
+
+cli.main(['npm', 'snapshots'])
@@ -0,0 +1,225 @@
+# This module MUST be used with python 2.x
+#
+# The command line of the cleaner. Jenkins passes its params (except creds) via env-vars in OS, the CLI flags set the
+# same env-vars, and then the engine and each policy parse them. The policies asked for ("-a", or POLICIES from
+# Jenkins) run one after the other in this process, so they share the HTTP session, worker pools and catalogs.
+
+import os
+import sys
+import argparse
+from artifactory_cleaner import engine
+from artifactory_cleaner.engine import lprint, WARNING
+from artifactory_cleaner.policies import POLICIES
+
+def main(default_policies, argv=None):
+    """ Main loop of the cleaner; run <default_policies> (names) unless told otherwise """
+
+    # These are only used for running on CLI. Jenkins passes its params (except creds) via env-vars in OS
+    parser = argparse.ArgumentParser(description='Artifactory cleaner')
+    parser.add_argument('-a', '--policies', help='Comma seperated policies to run (%s; default %s)' % (', '.join(sorted(POLICIES)), ','.join(default_policies)), type=str)
+    parser.add_argument('-d', '--days', help='Remove files older than this value', type=int)
+    parser.add_argument('-m', '--max_files', help='Maximum number of files to collect (snapshots)', type=int)
+    parser.add_argument('-s', '--shard', help='Groups (top level folders) to crawl a run, 0 is all (snapshots, default %d)' % POLICIES['snapshots'].SHARD_FOLDERS, type=int)
+    parser.add_argument('-c', '--create_time', help='Use file created time (instead of lastModified)', action='store_true')
+    parser.add_argument('-k', '--keep_file', help='Dont keep_file temp files', action='store_true')
+    parser.add_argument('-o', '--delete_one', help='Delete one file and exit', action='store_true')
+    parser.add_argument('-i', '--interactive', help='User confrims each delete', action='store_true')
+    parser.add_argument('-v', '--verbose', help='Be verbose in processing', action='store_true')
+    parser.add_argument('-g', '--generate', help='Dont generate saved data files', action='store_true')
+    parser.add_argument('-w', '--wait', help='Wait for user (should only be used on CLI)', action='store_true')
+    parser.add_argument('-D', '--delete', help='Set this flag to actually delete the files', action='store_true')
+    parser.add_argument('-N', '--dry_run', help='Check the delete candidates and report what deleting them would free (never deletes)', action='store_true')
+    parser.add_argument('-W', '--workers', help='Number of concurrent crawl workers (default %d)' % engine.WORKERS, type=int)
+    parser.add_argument('-Y', '--adaptive', help='Adjust the requests in flight (up to WORKERS) to how artifactory copes', action='store_true')
+    parser.add_argument('-C', '--connections', help='Max connections to artifactory (default %d)' % engine.MAX_CONNECTIONS, type=int)
+    parser.add_argument('-T', '--timeout', help='Seconds to wait for a response (default %d)' % engine.READ_TIMEOUT, type=int)
+    parser.add_argument('-b', '--by_file', help='Delete file by file instead of whole SNAPSHOT folders (snapshots)', action='store_true')
+    parser.add_argument('-L', '--log_level', help='Only log messages of this level and up (default debug)', choices=['debug', 'info', 'warning'])
+    parser.add_argument('-Z', '--log_size', help='Rotate the log once it is this many MB', type=int)
+    parser.add_argument('-q', '--progress', help='Log a progress line every this many seconds', type=int)
+    parser.add_argument('-K', '--cache', help='Keep folder/file info in %s and only fetch what changed' % engine.CACHE_FILE, action='store_true')
+    parser.add_argument('-H', '--cache_mb', help='Max size of the HTTP cache in MB (default %d)' % engine.CACHE_MAX_MB, type=int)
+    parser.add_argument('-J', '--cache_ttl', help='Hours a cached release file is trusted without asking (default %d)' % engine.CACHE_TTL_HOURS, type=float)
+    parser.add_argument('-O', '--order', help='Delete the biggest first (bytes), by age x size (age) or as listed (name) (default %s)' % engine.DELETE_ORDER, choices=['bytes', 'age', 'name'])
+    parser.add_argument('-G', '--reclaim', help='Stop deleting once this many GB are freed', type=float)
+    parser.add_argument('-R', '--rate', help='Max delete requests a second, 0 is no limit (default %d)' % engine.DELETE_RATE, type=float)
+    parser.add_argument('-X', '--retries', help='Times a failed delete is retried (default %d)' % engine.DELETE_RETRIES, type=int)
+    parser.add_argument('-t', '--traverse', help='Crawl every folder/file instead of using the list API', action='store_true')
+    parser.add_argument('-r', '--resume', help='Resume an interrupted crawl from its checkpoint file', action='store_true')
+    parser.add_argument('-I', '--incremental', help='Only catalog the files that changed since the last run', action='store_true')
+    parser.add_argument('-j', '--incremental_days', help='Crawl everything again once the last full crawl is this many days old (default %d)' % engine.INCREMENTAL_DAYS, type=int)
+    parser.add_argument('-F', '--format', help='Save catalogs as txt or sqlite (default %s)' % engine.CATALOG_FORMAT, choices=sorted(engine.STORES))
+    parser.add_argument('-M', '--match_version', help='Keep dev files whose package version is in the release repo (npm)', action='store_true')
+    parser.add_argument('-n', '--no_verify', help='Dont check the files against artifactory again before deleting', action='store_true')
+    parser.add_argument('-l', '--local', help='Scan the local copies of the repos in this folder (e.g. /art-backups/current/repositories)', type=str)
+    parser.add_argument('-P', '--stream', help='Decide each file (or group) as soon as it is crawled', action='store_true')
+    parser.add_argument('-E', '--early_delete', help='Delete each file/folder as soon as it is decided (implies -P)', action='store_true')
+    parser.add_argument('-S', '--skip', help='Comma seperated list of folders to add to the skip list of each policy', type=str)
+    parser.add_argument('-A', '--artifactory', help='Storage API url of the artifactory to clean (default %s)' % engine.BASE_PATH, type=str)
+    parser.add_argument('-u', '--user', help='username', required=True, type=str)
+    parser.add_argument('-p', '--password', help='passwd', required=True, type=str)
+
+    args   = parser.parse_args(argv)
+    user   = args.user
+    passwd = args.password
+
+    (base, ext) = os.path.splitext(engine.LOG_FILE)     # The log, and any rotated logs, of the last run
+    for f in [engine.LOG_FILE] + ['%s.%d%s' % (base, n, ext) for n in range(1, engine.LOG_BACKUPS + 1)]:
+        if os.path.exists(f):
+            os.remove(f)
+
+    if args.days:
+        engine.MAX_DAYS = args.days
+
+    # If we have CLI options we must set an env-var to be consistent.
+    # options not set as env-var are options Jenkins doesn't have
+    if args.policies:
+        os.environ["POLICIES"] = args.policies
+    if args.interactive:
+        engine.INTERACTIVE = True   # Confirm each delete
+        engine.VERBOSE = True       # We have to see what we're doing
+        engine.WAIT = True          # Wait for user input
+        engine.CLEAN = False        # Dont delete files
+        os.environ["DO_DELETE"]  = "1"
+    if args.delete_one:                 # CLI flag to delete one and exit
+        os.environ["DELETE_ONE"] = "1"  # Set same flag as envvar
+        os.environ["DO_DELETE"]  = "1"  # If we want to delete one we must make sure this option is set too
+    if args.delete:                     # CLI flag to delete files
+        os.environ["DO_DELETE"] = "1"   # Set same flag as envvar
+    if args.dry_run:
+        os.environ["DRY_RUN"] = "1"
+    if args.verbose:
+        os.environ["VERBOSE"] = "1"
+    if args.keep_file:                  # CLI flag to keep files
+        os.environ["KEEP_FILES"] = "1"  # Set same flag as envvar
+    if args.create_time:                # CLI flag; user requests we process 'created' tiem of file
+        os.environ["USE_CREATED_TIME"] = "1"  # Set same flag as envvar
+    if args.wait:
+        engine.WAIT = True
+    if args.workers:
+        os.environ["WORKERS"] = str(args.workers)   # Set same option as envvar
+    if args.adaptive:
+        os.environ["ADAPTIVE"] = "1"
+    if args.max_files:
+        os.environ["MAX_FILES_TO_COLLECT"] = str(args.max_files)
+    if args.shard is not None:
+        os.environ["SHARD_FOLDERS"] = str(args.shard)
+    if args.traverse:
+        os.environ["USE_TRAVERSE"] = "1"
+    if args.resume:
+        os.environ["RESUME"] = "1"
+    if args.incremental:
+        os.environ["INCREMENTAL"] = "1"
+    if args.incremental_days is not None:
+        os.environ["INCREMENTAL_DAYS"] = str(args.incremental_days)
+    if args.match_version:
+        os.environ["MATCH_VERSIONS"] = "1"
+    if args.no_verify:
+        os.environ["NO_VERIFY"] = "1"
+    if args.artifactory:
+        os.environ["ARTIFACTORY_URL"] = args.artifactory
+    if args.local:
+        os.environ["LOCAL_REPOS"] = args.local
+    if args.stream:
+        os.environ["STREAM"] = "1"
+    if args.early_delete:
+        os.environ["EARLY_DELETE"] = "1"
+    if args.format:
+        os.environ["CATALOG_FORMAT"] = args.format
+    if args.connections:
+        os.environ["MAX_CONNECTIONS"] = str(args.connections)
+    if args.timeout:
+        os.environ["HTTP_TIMEOUT"] = str(args.timeout)
+    if args.by_file:
+        os.environ["DELETE_BY_FILE"] = "1"
+    if args.log_level:
+        os.environ["LOG_LEVEL"] = args.log_level
+    if args.log_size:
+        os.environ["LOG_MAX_MB"] = str(args.log_size)
+    if args.progress:
+        os.environ["PROGRESS_SECS"] = str(args.progress)
+    if args.cache:
+        os.environ["HTTP_CACHE"] = "1"
+    if args.cache_mb:
+        os.environ["CACHE_MAX_MB"] = str(args.cache_mb)
+    if args.cache_ttl is not None:
+        os.environ["CACHE_TTL_HOURS"] = str(args.cache_ttl)
+    if args.order:
+        os.environ["DELETE_ORDER"] = args.order
+    if args.reclaim:
+        os.environ["RECLAIM_GB"] = str(args.reclaim)
+    if args.rate is not None:
+        os.environ["DELETE_RATE"] = str(args.rate)
+    if args.retries is not None:
+        os.environ["DELETE_RETRIES"] = str(args.retries)
+    if args.generate:
+        engine.GEN_SAVED_DATA = False   # Rely only on saved file data (for debugging)
+
+    # Which policies to run; a CLI "-a", or Jenkins' POLICIES, or the ones we were called with
+    names = default_policies
+    tmp   = os.getenv("POLICIES")
+    if tmp:
+        names = [n.strip() for n in tmp.split(',') if n.strip()]
+    for n in names:
+        if n not in POLICIES:
+            print 'Unknown policy "%s" (choose from %s) .. exiting' % (n, ', '.join(sorted(POLICIES)))
+            sys.exit(1)
+    policies = [POLICIES[n] for n in names]
+
+    if args.skip:               # Add these items to the skip list of each policy
+        for policy in policies:
+            policy.SKIP_FOLDERS.extend(args.skip.split(','))
+        if not engine.GEN_SAVED_DATA:
+            print 'Warning: "-S" should not be used with "-g" (since we will be generating new data)'
+
+    engine.parse_options()      # Parse any env-var options Jenkins sent (and/or we set above)
+    for policy in policies:
+        policy.parse_options()
+
+    # If these files were obtained via an OS call the timestamps do not reflect what Artifactory will show.
+    # So, to be safe, exit
+    if engine.FROM_OS and engine.DO_DELETE:
+        lprint('** Warning: These files have the system/OS timestamp and that WILL be different from the Artifactory timestamp!', False, WARNING)
+        lprint('Aborting', False)
+        sys.exit(0)
+
+    # A local copy has the OS timestamps, and those may not be what Artifactory shows. So it only gives us a list of
+    # candidates, which must be verified before they are deleted; to be safe, exit if they won't be
+    if engine.LOCAL_REPOS and engine.DO_DELETE and not engine.VERIFY:
+        lprint('** Warning: The local copies have the system/OS timestamps and those may differ from Artifactory!', False, WARNING)
+        lprint('Aborting (run without "-n" to verify the files before they are deleted)', False)
+        sys.exit(0)
+
+    if engine.DO_DELETE:
+        lprint ('** Delete option is set **', True)     # One last warning to show files will be removed
+        if engine.DELETE_ONE:
+            lprint ('** Delete one file and exit is also set **', False)
+
+    # Log, and maybe show, which options were called
+    engine.log_options()
+    lprint ('POLICIES: %s' % ', '.join(names), False)
+    for policy in policies:
+        policy.log_options()
+    print 'Script is running..'
+    engine.progress_start()
+
+    # With more than one policy, each one's list files are named after it (npm_deleters.txt, ..) so none are overwritten
+    runs = list()
+    for policy in policies:
+        prefix = policy.NAME + '_' if len(policies) > 1 else ''
+        run    = engine.new_run(policy, prefix)
+        runs.append(run)
+
+        lprint ('\nRunning %s policy (cleaning %s)\n%s' % (policy.NAME, run['target']['path'], engine.HEADER1), False)
+        engine.clean(run, user, passwd)
+
+    engine.progress_stop()
+    engine.write_stats(runs)    # Timing and HTTP numbers (kept, like the log)
+    engine.cache_close()
+
+    if engine.CLEAN:    # Clean temp files unless user said 'no'
+        engine.cleanup_temp_files(runs)
+    else:
+        lprint ('\nKeeping temporary files', False)
+
+    lprint ('\nJob complete\n', False)
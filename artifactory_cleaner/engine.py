@@ -0,0 +1,2955 @@
+# This module MUST be used with python 2.x
+#
+# The part of the cleaner every repo shares; crawl (or list, or scan) a repo into a catalog of file|timestamp, and
+# write out, verify and delete what a policy (see policies/) decides. Everything a repo's crawl needs is kept in its
+# repo dict (see new_repo), and everything a policy's run needs in its run dict (see new_run), so any number of repos
+# and policies can share the HTTP session, the worker pools and the caches in one process.
+
+import json
+import re
+import os
+import datetime
+import requests
+import sys
+import time
+import threading
+import Queue
+import atexit
+import bisect
+import random
+import sqlite3
+import array
+import collections
+import contextlib
+import marshal
+from requests.adapters import HTTPAdapter
+
+try:
+    from os import scandir              # Python 3.5+
+except ImportError:
+    try:
+        from scandir import scandir     # The python 2 backport (pip install scandir); only needed for LOCAL_REPOS
+    except ImportError:
+        scandir = None
+
+# When set, we collect all the data from artifactory and save that data for future test runs. If the flag is False, we dont
+# crawl and rely on the data saved (initially, these crawls are taking hours).
+GEN_SAVED_DATA = True   # By default we poll and save the data (False when debugging and we use saved catalog files)
+
+# There are so many files in some repos, and running this remotely can take days, I have a test script that collects
+# all files directly but they return the OS timestamp when I was expecting an Artifactory timestamp
+FROM_OS = False         # If True, process the OS timestamp. False, process Artifactory timestamp
+
+# Message levels (see lprint)
+DEBUG   = 10        # Per folder/file details
+INFO    = 20
+WARNING = 30        # Always shown
+
+HEADER1 = "=" * 80
+HEADER2 = "#" * 80
+
+# User options (some are only available via CLI)
+DELETE_ONE = False  # Delete one file and exit : CLI and Jenkins
+INTERACTIVE = False # Have user confirm deletion for each file (for debugging) : CLI
+CLEAN     = True    # Clean any files I create (except the log) : CLI and Jenkins (KEEP_FILES)
+LOG_DATA  = True
+LOG_LEVEL = 10      # Only log messages of this level and up (DEBUG 10, INFO 20, WARNING 30) : CLI and Jenkins
+LOG_MAX_MB = 0      # Rotate the log once it is this many MB (0 never rotates) : CLI and Jenkins
+LOG_BACKUPS = 3     # Rotated logs to keep (log.1.txt .. log.3.txt)
+VERBOSE   = False   # Show what's being done : CLI and Jenkins
+WAIT      = False   # Wait for user if true. : CLI
+DO_DELETE = False   # Saftey measure. You MUST call script with "-D" to actually delete : CLI and Jenkins
+DRY_RUN   = False   # Check the delete candidates (metadata only) and report what deleting them would free : CLI and Jenkins
+MAX_DAYS  = 60      # Delete files older than this many days : CLI and Jenkins
+USE_MODIFIED_TIME = True
+USE_CREATED_TIME = False
+WORKERS   = 8       # Max requests to artifactory at the same time (shared by the repos being crawled) : CLI and Jenkins
+USE_LIST_API = True # Build the catalogs from the file list API (False crawls every folder/file) : CLI and Jenkins
+RESUME    = False   # Pick up an interrupted crawl from its checkpoint file : CLI and Jenkins
+CHECKPOINT_SECS = 60    # Flush crawl progress to the checkpoint files at least this often
+INCREMENTAL = False # Only crawl folders that changed since the last run (keeps the catalogs) : CLI and Jenkins
+LOCAL_REPOS = ''    # Scan the local copies of the repos in this folder instead of artifactory : CLI and Jenkins
+LOCAL_IGNORE = ['.artifactory-metadata']    # Folders in the local copies that are artifactory's, not the repo's
+STREAM    = False   # Decide each file as the crawl finds it (instead of once the crawl is done) : CLI and Jenkins
+EARLY_DELETE = False    # Delete each file as soon as it is decided (so while the crawl is running) : CLI and Jenkins
+VERIFY    = True    # Check each file against artifactory (again) right before deleting it : CLI and Jenkins (NO_VERIFY)
+DELETE_ORDER = 'bytes'  # Delete the candidates biggest first ('bytes'), by age x size ('age') or as listed ('name') : CLI and Jenkins
+RECLAIM_GB = 0      # Stop deleting once this many GB are freed (0 deletes every candidate) : CLI and Jenkins
+INCREMENTAL_DAYS = 7    # INCREMENTAL: crawl everything again once the last full crawl is this many days old : CLI and Jenkins
+DELTA_MARGIN = 3600 # INCREMENTAL: ask for the changes since this many seconds before the last run started (clock skew)
+CATALOG_FORMAT = 'txt'  # Save catalogs as 'txt' (path|timestamp lines) or 'sqlite' (.db) : CLI and Jenkins
+STORE_BATCH = 5000  # Catalog rows a SQLite store inserts (or reads) at a time
+QUEUE_SIZE = 10000  # Max folders/files waiting in the shared crawl queue (workers keep any overflow to themselves)
+MAX_CONNECTIONS = 16    # Max open (keep-alive) connections to the artifactory host : CLI and Jenkins
+CONNECT_TIMEOUT = 10    # Seconds to wait for a connection to artifactory
+READ_TIMEOUT    = 120   # Seconds to wait for artifactory to answer a request : CLI and Jenkins (HTTP_TIMEOUT)
+DELETE_RATE     = 20    # Max delete requests a second (0 is no limit) : CLI and Jenkins
+DELETE_RETRIES  = 5     # Times a delete is retried after a 429/5xx or a failed connection : CLI and Jenkins
+RETRY_BACKOFF   = 1.0   # Seconds to wait before the first retry (doubled for each one after that)
+MAX_BACKOFF     = 60    # Never wait longer than this many seconds between retries
+CHUNK_SIZE      = 65536 # Bytes read at a time when streaming a (list API) response
+PROGRESS_SECS   = 0     # Log a progress line this often while the job runs (0 never does) : CLI and Jenkins
+HTTP_CACHE      = False # Keep folder/file info between runs and only ask artifactory if it changed : CLI and Jenkins
+CACHE_MAX_MB    = 256   # Drop the least recently used cache entries once the cache is this many MB : CLI and Jenkins
+CACHE_TTL_HOURS = 24    # Trust a cached file of an immutable repo (npm-release) this long without asking : CLI and Jenkins
+CACHE_COMMIT    = 1000  # Commit the cache (see cache_put) after this many changes
+ADAPTIVE        = False # Adjust the requests in flight (up to WORKERS) to how artifactory is coping : CLI and Jenkins
+ADAPT_ERROR_CUT = 0.5   # Multiply the requests in flight by this after a 429/5xx or a failed connection
+ADAPT_SLOW_CUT  = 0.8   # .. and by this when the latency is ADAPT_SLOW times what it has been
+ADAPT_SLOW      = 2.0   # Latency (smoothed) this many times its long run average means artifactory is struggling
+ADAPT_SLOW_MIN  = 0.1   # .. unless it is under this many seconds (a few ms either way is just noise)
+BREAKER_WINDOW  = 20    # Requests looked at by the circuit breaker (see throttle_sample)
+BREAKER_ERRORS  = 0.5   # Pause all requests once this share of the last BREAKER_WINDOW failed (429/5xx/connection)
+BREAKER_SECS    = 30    # Seconds of the first pause (doubled each time the breaker trips again before a success)
+BREAKER_MAX_SECS = 300  # Never pause longer than this
+BUSY_RETRIES    = 5     # ADAPTIVE: times collect_data asks again after a 429/503 (artifactory is busy)
+
+# This is where the repos are (each repo's path is this + '/' + its name, see new_repo) : CLI and Jenkins (ARTIFACTORY_URL)
+BASE_PATH = 'http://artifactory.bullhorn.com:8081/artifactory/api/storage'
+
+# Misc files generated. The list files of a policy (see new_run) are these, and whatever else the policy lists.
+LOG_FILE   = 'log.txt'              # Script output log
+STATS_FILE = 'run_stats.json'       # Timing and HTTP numbers of the run (see write_stats); kept, like the log
+CACHE_FILE = 'http_cache.db'        # Folder/file info cache (see cache_open); kept between runs
+LIST_FILES = {'keep':    'keepers.txt',         # Files too young to delete
+              'delete':  'deleters.txt',        # Files (or folders) to delete
+              'failed':  'failed_deletes.txt',  # Files I could not delete
+              'drift':   'drifted.txt',         # Delete candidates artifactory has changed since they were cataloged
+              'projected': 'projected_deletes.txt', # What a delete run would free, by group (DRY_RUN)
+              'skipped': 'skipped.txt'}         # Files/folders to skip (matched the skip lists)
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+TODAY         = int(time.time()) // 86400   # Today's UTC day number (see epoch_day)
+DAY_CACHE     = dict()                      # UTC second each date/offset seen by epoch_day starts at
+MINUTES       = dict(('%02d:%02d' % (h, m), h * 3600 + m * 60) for h in range(24) for m in range(60))  # "HH:MM" secs
+
+LOG_LOCK = threading.Lock()     # lprint is called from every crawl worker; keep the log lines from interleaving
+LOG_QUEUE = Queue.Queue()       # Messages waiting for the log writer thread (see log_writer)
+LOG_THREAD = None
+SESSION  = None                 # Shared HTTP session (see http_session)
+SESSION_LOCK = threading.Lock()
+THROTTLE     = dict()           # Requests in flight and their limit, shared by every crawl running (see throttle_reset)
+THROTTLE_COND = threading.Condition()
+CATALOGS     = dict()           # Catalog of each repo crawled by this process, so a repo is crawled once (see repo_catalog)
+BUCKET       = {'tokens': 0.0, 'time': time.time()}  # Delete rate limit token bucket (see rate_limit)
+BUCKET_LOCK  = threading.Lock()
+RECLAIM      = {'sizes': dict(), 'freed': 0, 'left': 0, 'groups': dict()}   # Bytes of each delete uri, freed so far (see plan_deletes) and group files (see group_keys)
+RECLAIM_LOCK = threading.Lock()
+DECODER      = json.JSONDecoder()  # Used to decode list API entries one at a time (see stream_list)
+CACHE        = {'db': None, 'bytes': 0, 'changes': 0}   # Open HTTP_CACHE and its size (see cache_open)
+CACHE_LOCK   = threading.Lock()
+
+# What the run did, for the summary in STATS_FILE. The HTTP numbers are updated by every thread (see record_request).
+METRICS      = {'started': time.time(), 'phases': list(), 'requests': dict(), 'bytes': 0, 'errors': 0, 'retries': 0,
+                'parse_secs': 0.0, 'entries': 0, 'latency': array.array('d'), 'cache_hits': 0, 'cache_304s': 0,
+                'cache_misses': 0}
+METRICS_LOCK = threading.Lock()
+PROGRESS_STOP = threading.Event()   # Set to stop the progress thread (see progress_start)
+
+def new_repo(name, prefix, clean=True, skip_folders=(), skip_files=(), folder_files=(), shard=0, max_files=0,
+             immutable=False):
+    """ Return the state of repo <name> for the crawl; its files are named after <prefix> (<prefix>_catalog.txt,
+        etc). Only a repo we <clean> has skip lists, and only its skipped/null date files are listed as skipped.
+
+          folder_files  skipped files that don't stop their folder from being deleted as a whole (see folder_drift)
+          shard         crawl this many top level folders (groups) a run (see shard_select); 0 crawls them all
+          max_files     stop collecting once we have this many files (0 is no limit)
+          immutable     its files never change once published, so a cached file is trusted (see collect_data)
+    """
+
+    repo = {'name': name, 'path': BASE_PATH + '/' + name, 'clean': clean,
+            'catalog': prefix + '_catalog' + STORES[CATALOG_FORMAT]['ext'], 'format': CATALOG_FORMAT,
+            'delta_file': prefix + '_delta.json',       # What the last crawl saw (for "-I", see delta_close)
+            'checkpoint': prefix + '_catalog.checkpoint',   # Crawl progress (for "-r")
+            'cursor': prefix + '_cursor.txt',           # Last group crawled (see shard_select)
+            'skip_folders': list(skip_folders), 'skip_files': list(skip_files), 'folder_files': list(folder_files),
+            'shard': shard, 'max_files': max_files, 'immutable': immutable}
+
+    # The skip lists are complete now (the options have been parsed), so compile them once
+    try:
+        repo['folder_rules'] = compile_rules(repo['skip_folders'])
+        repo['file_rules']   = compile_rules(repo['skip_files'])
+    except re.error as e:
+        lprint ('Bad skip rule (%s) .. exiting' % e, False)
+        sys.exit(1)
+
+    repo['skipped']      = list()           # Skipped files/folders (see add_skipped)
+    repo['store']        = None             # Catalog being saved as it is crawled (see store_open)
+    repo['delta']        = None             # Last run's catalog for an incremental crawl (see delta_open)
+    repo['auth']         = None             # (user, password) for an incremental crawl's AQL search (see clean)
+    repo['ckpt']         = None             # Open checkpoint journal of the crawl (see checkpoint_open)
+    repo['pipe']         = None             # Queue the files are sent down as they are found (see stream_catalog)
+    repo['pipe_size']    = 0                # Items the pipe can hold before the crawl waits for it (0 is no limit)
+    repo['collected']    = 0                # Files collected so far (see count_collected)
+    repo['count_lock']   = threading.Lock()
+    repo['max_shown']    = False            # Set once max_files was reached
+    repo['shard_cursor'] = None             # Last group this run crawls (saved to 'cursor' once the job is done)
+    repo['sizes']        = dict()           # Bytes of each file in the catalog (when we know it); saved with the catalog
+    repo['groups']       = dict()           # Files (with sizes) of each group, for EARLY_DELETE (see add_size)
+
+    return repo
+
+def new_run(policy, prefix=''):
+    """ Return the state of a run of <policy>; its repos (the last one is the one cleaned), the catalogs, and the list
+        files its decisions go to (named with <prefix> so several policies can run in one process).
+    """
+
+    lists = dict(LIST_FILES)
+    lists.update(policy.LIST_FILES)
+
+    repos = policy.repos()
+    return {'policy': policy, 'repos': repos, 'target': repos[-1], 'catalogs': dict(), 'skipped': list(), 'errors': list(),
+            'counts': dict(), 'deletes': None, 'projected': None, 'deleted': list(),
+            'lists': dict((k, prefix + v) for (k, v) in lists.items())}
+
+def http_session():
+    """ Return the HTTP session shared by the crawl and delete_files(), creating it on first use.
+
+        Every request goes through one connection pool, so we reuse keep-alive sockets instead of paying for a new
+        process (curl) and a new TCP connection per uri. pool_block caps the connections we open to the host.
+    """
+    global SESSION
+
+    with SESSION_LOCK:                      # Crawl workers may all ask for it at the same time
+        if SESSION is None:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONNECTIONS, pool_block=True)
+            SESSION = requests.Session()
+            SESSION.mount('http://', adapter)
+            SESSION.mount('https://', adapter)
+
+    return SESSION
+
+def http_request(method, uri, **kwargs):
+    """ Send one request through the shared session and record how long it took (see record_request). The body of a
+        <stream> response is not read here, so its bytes are recorded by whoever reads it (see stream_list).
+    """
+
+    start = time.time()
+    try:
+        resp = http_session().request(method, uri, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+    except requests.exceptions.RequestException:
+        record_request(method, time.time() - start, 0, None)
+        throttle_sample(None, None)
+        raise
+
+    nbytes = 0
+    if not kwargs.get('stream'):
+        nbytes = len(resp.content)
+    secs = time.time() - start
+    record_request(method, secs, nbytes, resp.status_code)
+    # How long a listing takes is down to the size of the folder, not how busy artifactory is
+    throttle_sample(None if kwargs.get('stream') else secs, resp.status_code)
+
+    return resp
+
+def record_request(method, secs, nbytes, status):
+    """ Count one request (a status of None is one that failed to connect) in the run's HTTP numbers """
+
+    with METRICS_LOCK:
+        METRICS['requests'][method] = METRICS['requests'].get(method, 0) + 1
+        METRICS['latency'].append(secs)
+        METRICS['bytes'] = METRICS['bytes'] + nbytes
+        if status is None or status >= 400:
+            METRICS['errors'] = METRICS['errors'] + 1
+
+def record(key, n):
+    """ Add <n> to one of the run's numbers (bytes, retries, parse_secs, entries) """
+
+    with METRICS_LOCK:
+        METRICS[key] = METRICS[key] + n
+
+def throttle_reset():
+    """ Start the request slots afresh (see parse_options). With ADAPTIVE the limit starts at half of WORKERS and is
+        moved by throttle_sample (never above WORKERS); otherwise it is WORKERS.
+    """
+
+    with THROTTLE_COND:
+        limit = max(WORKERS // 2, 1) if ADAPTIVE else max(WORKERS, 1)
+        THROTTLE.clear()
+        THROTTLE.update({'limit': float(limit), 'inflight': 0, 'fast': None, 'slow': None, 'cut_at': 0.0,
+                         'window': collections.deque(maxlen=BREAKER_WINDOW), 'open_until': 0.0, 'probing': False,
+                         'tripped': 0, 'lowest': limit, 'cuts': 0, 'trips': 0, 'paused_secs': 0.0})
+        THROTTLE_COND.notify_all()
+
+def slot_acquire():
+    """ Wait for one of the request slots; there are at most THROTTLE['limit'] requests in flight, and none while the
+        circuit breaker is open (see throttle_trip).
+    """
+
+    with THROTTLE_COND:
+        while True:
+            wait = THROTTLE['open_until'] - time.time()
+            if wait > 0:                                # Paused; artifactory needs a break
+                THROTTLE_COND.wait(wait)
+            elif THROTTLE['inflight'] < int(THROTTLE['limit']):
+                THROTTLE['inflight'] = THROTTLE['inflight'] + 1
+                return
+            else:
+                THROTTLE_COND.wait()
+
+def slot_release():
+    """ Give back a request slot """
+
+    with THROTTLE_COND:
+        THROTTLE['inflight'] = THROTTLE['inflight'] - 1
+        THROTTLE_COND.notify()
+
+@contextlib.contextmanager
+def request_slot():
+    """ Hold a request slot for the body of a "with" """
+
+    slot_acquire()
+    try:
+        yield
+    finally:
+        slot_release()
+
+def throttle_sample(secs, status):
+    """ ADAPTIVE: move the request slot limit (AIMD) after a request that took <secs> (None if its latency says
+        nothing) and got <status> (None if the connection failed).
+
+        Each answer that is fine adds 1/limit to the limit (so a limit's worth of them adds one slot), up to WORKERS.
+        A 429/5xx or failed connection multiplies it by ADAPT_ERROR_CUT, and a latency ADAPT_SLOW times its long run
+        average by ADAPT_SLOW_CUT; at most one cut per (smoothed) round trip, since the requests already in flight
+        answer the same way. When BREAKER_ERRORS of the last BREAKER_WINDOW requests failed, the breaker trips.
+    """
+
+    if not ADAPTIVE:
+        return
+
+    failed = status is None or status == 429 or status >= 500
+    now    = time.time()
+    with THROTTLE_COND:
+        if now < THROTTLE['open_until']:            # Sent before the breaker tripped; we know already
+            return
+
+        window = THROTTLE['window']
+        window.append(failed)
+        if failed:
+            if THROTTLE['probing'] or (len(window) == BREAKER_WINDOW and sum(window) >= BREAKER_ERRORS * BREAKER_WINDOW):
+                throttle_trip(now)
+            else:
+                throttle_cut(now, ADAPT_ERROR_CUT, 'status %s' % status)
+            return
+
+        if THROTTLE['probing']:                     # The first answer since the pause was fine; carry on
+            lprint ('Artifactory is answering again; resuming requests', False, WARNING)
+            THROTTLE['probing'] = False
+            THROTTLE['tripped'] = 0
+
+        if secs is not None:
+            if THROTTLE['fast'] is None:
+                THROTTLE['fast'] = THROTTLE['slow'] = secs
+            THROTTLE['fast'] = 0.8 * THROTTLE['fast'] + 0.2 * secs     # The last few requests
+            THROTTLE['slow'] = 0.98 * THROTTLE['slow'] + 0.02 * secs    # The last hundred or so
+            if THROTTLE['fast'] > max(ADAPT_SLOW * THROTTLE['slow'], ADAPT_SLOW_MIN):
+                throttle_cut(now, ADAPT_SLOW_CUT, 'latency %.0f ms' % (THROTTLE['fast'] * 1000))
+                return
+
+        before = int(THROTTLE['limit'])
+        THROTTLE['limit'] = min(float(WORKERS), THROTTLE['limit'] + 1.0 / THROTTLE['limit'])
+        if int(THROTTLE['limit']) > before:
+            THROTTLE_COND.notify()                  # One more request can go
+
+def throttle_cut(now, factor, why):
+    """ Multiply the request slot limit by <factor> (called under THROTTLE_COND) """
+
+    if now - THROTTLE['cut_at'] < (THROTTLE['fast'] or 1.0):
+        return
+
+    THROTTLE['cut_at'] = now
+    THROTTLE['cuts']   = THROTTLE['cuts'] + 1
+    THROTTLE['limit']  = max(1.0, THROTTLE['limit'] * factor)
+    THROTTLE['lowest'] = min(THROTTLE['lowest'], int(THROTTLE['limit']))
+    lprint ('Throttling (%s): %d requests in flight' % (why, int(THROTTLE['limit'])), False, DEBUG)
+
+def throttle_trip(now):
+    """ Circuit breaker: stop sending requests for BREAKER_SECS (doubled each time it trips again before a request
+        has worked, up to BREAKER_MAX_SECS), then let one request through to see if artifactory is back (called under
+        THROTTLE_COND).
+    """
+
+    pause = min(BREAKER_SECS * 2 ** THROTTLE['tripped'], BREAKER_MAX_SECS)
+    THROTTLE['tripped']     = THROTTLE['tripped'] + 1
+    THROTTLE['trips']       = THROTTLE['trips'] + 1
+    THROTTLE['paused_secs'] = THROTTLE['paused_secs'] + pause
+    THROTTLE['open_until']  = now + pause
+    THROTTLE['probing']     = True
+    THROTTLE['limit']       = 1.0
+    THROTTLE['lowest']      = 1
+    THROTTLE['window'].clear()
+    lprint ('** Artifactory is failing requests; pausing them for %d seconds' % pause, False, WARNING)
+
+def collect_data(uri, immutable=False):
+    """ Collect URI data via the shared HTTP session and return output in a dict.
+
+        With HTTP_CACHE, what artifactory sent last time is asked for with its ETag/Last-Modified, and a 304 (not
+        changed) answer costs no body or JSON parse. A file of an <immutable> repo cached less than CACHE_TTL_HOURS ago
+        is not asked for at all.
+    """
+
+    data    = list()
+    entry   = None
+    headers = dict()
+
+    lprint ('Processing: %s' % uri, False, DEBUG)
+
+    if HTTP_CACHE:
+        entry = cache_get(uri)
+        if entry is None:
+            record('cache_misses', 1)
+        elif immutable and not entry['folder'] and time.time() - entry['stored'] < CACHE_TTL_HOURS * 3600:
+            record('cache_hits', 1)                                 # A published file never changes
+            return entry['data']
+        else:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['modified']:
+                headers['If-Modified-Since'] = entry['modified']
+
+    # requests quotes the uri for us, so file names with spaces and/or parenthesis are no longer an issue
+    try:
+        for n in range(BUSY_RETRIES + 1):
+            with request_slot():                                    # Wait for one of the request slots
+                resp = http_request('GET', uri, headers=headers)
+            if not ADAPTIVE or resp.status_code not in [429, 503] or n == BUSY_RETRIES:
+                break
+            record('retries', 1)                                    # Busy; there are fewer slots now, so wait our turn
+            time.sleep(RETRY_BACKOFF * (2 ** n) * random.uniform(0.5, 1.5))
+    except requests.exceptions.RequestException as e:               # Connection refused, timeout, etc.
+        lprint('! Request ERROR %s' % e, False)
+    except:                                                         # All other exceptions caught here
+        lprint('! Unknown ERROR: Sys: %s' % sys.exc_info()[0], False)   # Display the system error
+    else:                                                           # No exception, so continue processing..
+        if entry is not None and resp.status_code == 304:           # Not changed since we cached it
+            record('cache_304s', 1)
+            cache_touch(uri)
+            return entry['data']
+        try:                                                        # Try and convert the response to JSON
+            start = time.time()
+            data = resp.json()                                      # Ok, we converted to JSON
+            record('parse_secs', time.time() - start)
+            if 'errors' in data:                                    # Sometimes the request worked but we get bad data
+                lprint('! ERROR: Request returned: %s' % data, False)   # Show the error returned by artifactory
+                data = list()                                       # Return empty dict
+                if entry is not None:                               # Gone (or broken); don't offer it again
+                    cache_forget(uri)
+            elif HTTP_CACHE and resp.status_code == 200:
+                cache_put(uri, resp, data, immutable)
+        except ValueError as e:                                     # Some pesky files don't produce any output :(
+            lprint('! ValueError: Could not convert data to JSON', False) # So log it and move on
+        except:                                                     # Grab all other exceptions here
+            lprint('! Unknown ERROR: Sys: %s' % sys.exc_info()[0], False)  # Get error from system
+
+    return data         # Return the data dict (whether it has data or is None)
+
+def cache_open():
+    """ Open the HTTP_CACHE (CACHE_FILE) on first use. It is a SQLite table of the folder/file info artifactory sent
+        for each uri, with the ETag/Last-Modified to ask for it again with; the info is kept marshalled, so a hit
+        costs no JSON parse either. A cache we can't read is started again; it only costs requests.
+    """
+
+    if CACHE['db'] is not None:
+        return CACHE['db']
+
+    for n in range(2):
+        try:
+            db = sqlite3.connect(CACHE_FILE, check_same_thread=False)  # Used by every worker (under CACHE_LOCK)
+            db.execute('PRAGMA synchronous = OFF')                  # Losing the last changes only costs requests
+            db.execute('CREATE TABLE IF NOT EXISTS cache (uri TEXT PRIMARY KEY, etag TEXT, modified TEXT, '
+                       'folder INTEGER, data BLOB, size INTEGER, stored REAL, used REAL)')
+            db.execute('CREATE INDEX IF NOT EXISTS cache_used ON cache (used)')
+            CACHE['bytes'] = db.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+            break
+        except sqlite3.DatabaseError as e:
+            lprint ('! Could not open %s (%s) .. starting a new cache' % (CACHE_FILE, e), False)
+            if os.path.exists(CACHE_FILE):
+                os.remove(CACHE_FILE)
+    else:
+        raise RuntimeError('Could not create %s' % CACHE_FILE)
+
+    CACHE['db'] = db
+    atexit.register(cache_close)
+    lprint ('HTTP cache %s: %.1f MB' % (CACHE_FILE, CACHE['bytes'] / 1048576.0), False)
+
+    return db
+
+def cache_get(uri):
+    """ Return the cache entry of <uri> (etag, modified, folder, data, stored), or None """
+
+    with CACHE_LOCK:
+        row = cache_open().execute('SELECT etag, modified, folder, data, stored FROM cache WHERE uri = ?',
+                                   (uri,)).fetchone()
+    if row is None:
+        return None
+
+    return {'etag': row[0], 'modified': row[1], 'folder': bool(row[2]), 'data': marshal.loads(str(row[3])),
+            'stored': row[4]}
+
+def cache_put(uri, resp, data, immutable):
+    """ Cache the <data> of <uri> from response <resp>. Only what we can ask for again (it came with an ETag or a
+        Last-Modified), or a file of an <immutable> repo, is worth keeping.
+    """
+
+    etag     = resp.headers.get('ETag')
+    modified = resp.headers.get('Last-Modified')
+    folder   = 'children' in data
+    if not (etag or modified or (immutable and not folder)):
+        return
+
+    blob = marshal.dumps(data)
+    now  = time.time()
+    with CACHE_LOCK:
+        db  = cache_open()
+        old = db.execute('SELECT size FROM cache WHERE uri = ?', (uri,)).fetchone()
+        db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                   (uri, etag, modified, int(folder), sqlite3.Binary(blob), len(blob), now, now))
+        CACHE['bytes'] = CACHE['bytes'] + len(blob) - (old[0] if old else 0)
+        if CACHE['bytes'] > CACHE_MAX_MB * 1048576:
+            cache_evict(db)
+        cache_changed(db)
+
+def cache_touch(uri):
+    """ Mark the cache entry of <uri> as just used (see cache_evict) """
+
+    with CACHE_LOCK:
+        db = cache_open()
+        db.execute('UPDATE cache SET used = ? WHERE uri = ?', (time.time(), uri))
+        cache_changed(db)
+
+def cache_forget(uri):
+    """ Drop the cache entry of <uri> """
+
+    with CACHE_LOCK:
+        db  = cache_open()
+        old = db.execute('SELECT size FROM cache WHERE uri = ?', (uri,)).fetchone()
+        if old:
+            db.execute('DELETE FROM cache WHERE uri = ?', (uri,))
+            CACHE['bytes'] = CACHE['bytes'] - old[0]
+            cache_changed(db)
+
+def cache_evict(db):
+    """ Drop the least recently used entries until the cache is back under CACHE_MAX_MB (called under CACHE_LOCK) """
+
+    limit = CACHE_MAX_MB * 1048576
+    while CACHE['bytes'] > limit:
+        rows = db.execute('SELECT uri, size FROM cache ORDER BY used LIMIT 500').fetchall()
+        if not rows:
+            CACHE['bytes'] = 0
+            break
+        for (uri, size) in rows:
+            db.execute('DELETE FROM cache WHERE uri = ?', (uri,))
+            CACHE['bytes'] = CACHE['bytes'] - size
+            if CACHE['bytes'] <= limit:
+                break
+
+def cache_changed(db):
+    """ Count a change to the cache, committing every CACHE_COMMIT of them (called under CACHE_LOCK) """
+
+    CACHE['changes'] = CACHE['changes'] + 1
+    if CACHE['changes'] >= CACHE_COMMIT:
+        db.commit()
+        CACHE['changes'] = 0
+
+def cache_close():
+    """ Commit and close the HTTP_CACHE (if it was opened) """
+
+    with CACHE_LOCK:
+        if CACHE['db'] is not None:
+            CACHE['db'].commit()
+            CACHE['db'].close()
+            CACHE['db'] = None
+
+def stream_list(uri):
+    """ Generator: yield the entries of a list API response's "files" array as they are read off the socket.
+
+        A deep listing of a big folder can be hundreds of MB of JSON. Rather than json.loads() the whole body, each
+        file entry is decoded (raw_decode) as soon as all of it has arrived, so we never hold more than one chunk of
+        the response. Raises ValueError if the response is not a listing. The listing holds one of the request slots
+        (see slot_acquire) until all of it has been read.
+    """
+
+    lprint ('Listing: %s' % uri, False)
+    slot_acquire()
+    try:
+        resp = http_request('GET', uri, stream=True)
+    except:
+        slot_release()
+        raise
+    nbytes = 0                      # Read so far
+    parse  = 0.0                    # Seconds spent decoding it
+    try:
+        if not 200 <= resp.status_code <= 299:  # Success values (200-299)
+            raise ValueError('request status returned: %d' % resp.status_code)
+
+        chunks = resp.iter_content(CHUNK_SIZE)
+        buf    = ''
+        pos    = -1
+
+        # Read until we find the start of the "files" array
+        for chunk in chunks:
+            nbytes = nbytes + len(chunk)
+            buf = buf + chunk
+            pos = buf.find('"files"')
+            if pos >= 0 and buf.find('[', pos) >= 0:
+                break
+        if pos < 0 or buf.find('[', pos) < 0:
+            raise ValueError('no "files" found in the response')
+        pos = buf.find('[', pos) + 1
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':    # Skip the white space/commas between entries
+                pos = pos + 1
+            if pos < len(buf) and buf[pos] == ']':              # End of the array; we're done
+                return
+
+            start = time.time()
+            try:
+                entry, end = DECODER.raw_decode(buf, pos)       # Decode the next entry
+            except ValueError:                                  # It has not all arrived yet, so read some more
+                parse = parse + time.time() - start
+                chunk = next(chunks, None)
+                if chunk is None:
+                    raise ValueError('response ended in the middle of the "files" array')
+                nbytes = nbytes + len(chunk)
+                buf = buf[pos:] + chunk                         # Drop what we have already decoded
+                pos = 0
+                continue
+
+            parse = parse + time.time() - start
+            pos = end
+            yield entry
+    finally:
+        resp.close()                # Hand the connection back to the pool (even if the caller stopped early)
+        slot_release()
+        record('bytes', nbytes)
+        record('parse_secs', parse)
+
+def build_catalog(repo, catalog):
+    """ Crawl (or list) <repo> into <catalog>, journaling progress to its checkpoint file as we go. An INCREMENTAL
+        crawl brings the last run's catalog up to date with the files artifactory says have changed (see delta_apply).
+
+        That does not see files removed since, so only the repo we clean is crawled incrementally; its delete
+        candidates are verified against artifactory before they are deleted. Nothing checks a repo we only check
+        against (a release file the catalog still has would keep its dev copy forever), so all of it is crawled
+        every run.
+    """
+
+    start = time.time()
+    store_open(repo)                # Every entry is saved as it is added (see add_entry)
+    done  = checkpoint_open(repo, catalog)
+
+    if repo['pipe'] is not None:    # What a resumed crawl already has goes down the pipeline first
+        for (k, v) in catalog.items():
+            pipe_put(repo, ('F', k, v))
+
+    if done:
+        lprint ('Crawl already completed in "%s"' % repo['checkpoint'], False)
+    else:
+        repo['collected'] = len(catalog)    # Files a resumed crawl already has count towards 'max_files'
+        if LOCAL_REPOS:             # A local scan is quick, so it is never incremental
+            scan_repo(repo, catalog)
+        else:
+            if INCREMENTAL and repo['clean']:     # The state is saved once the run is done (see delta_close)
+                delta_open(repo)
+            if not delta_apply(repo, catalog):  # Unless the last run's catalog could be brought up to date
+                if USE_LIST_API:
+                    list_repo(repo, catalog)
+                else:
+                    traverse(repo, catalog)
+    checkpoint_close(repo)
+    add_phase('crawl', start, len(catalog), repo=repo['name'])
+
+    return(catalog)
+
+def repo_catalog(repo):
+    """ Return the catalog of <repo>, built (and saved) the first time a run of this process asks for it. A repo more
+        than one policy checks against (say a release repo) is then only crawled once.
+    """
+
+    key = (repo['path'], delta_rules(repo))     # Another policy may skip other files in the same repo
+    if key not in CATALOGS:
+        lprint ('\nGenerating %s catalog\n%s' % (repo['name'], HEADER1), False)
+        catalog = build_catalog(repo, Catalog())
+        store_close(repo, catalog)
+        CATALOGS[key] = catalog
+
+    return CATALOGS[key]
+
+def crawl_others(run):
+    """ Start building the catalogs of the repos <run> checks against (all but the last) in background threads, so
+        they are crawled at the same time as the repo we clean. Returns the threads (see wait_others).
+    """
+
+    threads = list()
+    for repo in run['repos'][:-1]:
+        t = threading.Thread(target=other_worker, args=(run, repo))
+        t.daemon = True             # Never let a stuck crawl keep the script alive
+        t.start()
+        threads.append(t)
+
+    return threads
+
+def other_worker(run, repo):
+    """ Thread for crawl_others: build the catalog of <repo> into the run's catalogs """
+
+    try:
+        run['catalogs'][repo['name']] = repo_catalog(repo)
+    except BaseException as e:      # sys.exit() included; wait_others raises it in the main thread
+        lprint ('! Crawl of %s failed: %s' % (repo['name'], e), False, WARNING)
+        run['errors'].append(e)
+
+def wait_others(run, threads):
+    """ Wait for the catalogs crawl_others is building. Raises the first error any of them stopped on. """
+
+    for t in threads:
+        t.join()
+    if len(run['errors']) > 0:
+        raise run['errors'][0]
+
+def stream_catalog(repo, catalog, size=QUEUE_SIZE):
+    """ Run build_catalog in a background thread. Every file it adds to <catalog> is also sent down the returned
+        queue (of at most <size> items; 0 is no limit, until 'pipe_size' is set) as it is found (see add_entry), as
+        is each group once it has been listed (see list_group), followed by None once the crawl is done (or the
+        error that stopped it). Returns (queue, thread).
+    """
+
+    pipe = Queue.Queue()            # Bounded by pipe_put, so the bound can be set once the crawl is running
+    repo['pipe']      = pipe
+    repo['pipe_size'] = size
+
+    def crawl():
+        try:
+            build_catalog(repo, catalog)
+        except Exception as e:
+            lprint ('! Crawl of %s failed: %s' % (repo['name'], e), False, WARNING)
+            pipe.put(e)
+        else:
+            pipe.put(None)
+        finally:
+            repo['pipe'] = None
+
+    t = threading.Thread(target=crawl)
+    t.daemon = True                 # Never let a stuck crawl keep the script alive
+    t.start()
+
+    return (pipe, t)
+
+def pipe_put(repo, item):
+    """ Send <item> down the pipe of <repo> (see stream_catalog). If the pipeline has fallen behind (the pipe holds
+        'pipe_size' items), wait for it first. Never called holding a request slot, so the other crawls can't be held
+        up by a pipeline that is waiting for them.
+    """
+
+    pipe = repo['pipe']
+    with pipe.not_full:             # Notified every time the pipeline takes an item
+        while 0 < repo['pipe_size'] <= len(pipe.queue):
+            pipe.not_full.wait()
+    pipe.put(item)
+
+def drain(repo, pipe, by_group):
+    """ Pipeline source: yield the (file, timestamp) pairs sent down <pipe> in batches until the crawl is done; one
+        pair a batch, or with <by_group> a group at a time, as soon as the group has been listed (the files of groups
+        that were crawled instead, and the files in the root, come once the crawl is done).
+    """
+
+    groups = dict()                 # (file, timestamp) pairs of each group still being crawled
+    seen   = set()                  # A resumed crawl may list a folder it had partly listed again
+    while True:
+        item = pipe.get()
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            raise item
+
+        if item[0] == 'G':
+            entries = groups.pop(item[1], None)
+            if entries:
+                yield entries
+        elif item[1] in seen:
+            continue
+        elif by_group:
+            seen.add(item[1])
+            groups.setdefault(file_group(repo, item[1]), list()).append(item[1:])
+        else:
+            seen.add(item[1])
+            yield [item[1:]]
+
+    for g in sorted(groups):
+        yield groups[g]
+
+def file_group(repo, uri):
+    """ Return the group (top level folder, as list_repo names it) <uri> is in, or '' for a file in the root """
+
+    parts = uri[len(repo['path']):].split('/')
+    if len(parts) > 2:
+        return '/' + parts[1]
+    return ''
+
+def delta_open(repo):
+    """ For an incremental crawl, load what the last run of <repo> saved (see delta_close) and decide if its catalog
+        can be brought up to date (see delta_apply) instead of crawling everything. It can't on the first run, if the
+        skip lists have changed, once the last full crawl is INCREMENTAL_DAYS old, or if the catalog has no sizes.
+    """
+
+    now   = time.time()
+    delta = {'since': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(now - DELTA_MARGIN)), 'full': now,
+             'state': None}
+    repo['delta'] = delta
+
+    state  = None
+    reason = None
+    if os.path.exists(repo['delta_file']) and os.path.exists(repo['catalog']):
+        with open(repo['delta_file']) as fi:
+            state = json.load(fi)
+
+    if state is None:
+        reason = 'No saved "%s"/"%s"' % (repo['catalog'], repo['delta_file'])
+    elif state['rules'] != delta_rules(repo):   # A newly skipped file in the last run's catalog would be deleted
+        reason = 'Skip lists changed since the last run'
+    elif now - state['full'] > INCREMENTAL_DAYS * 86400:    # Files removed since then are still in the catalog
+        reason = 'The last full crawl is %d days old' % ((now - state['full']) // 86400)
+    else:
+        (catalog, sizes) = store_load(repo)
+        if len(sizes) == 0 and len(catalog) > 0:    # Saved by an older version; reusing it would leave it unsized
+            reason = 'The last run saved no file sizes'
+        else:
+            delta.update({'state': state, 'full': state['full'], 'catalog': catalog, 'sizes': sizes})
+
+    if reason is not None:
+        lprint ('%s .. crawling everything' % reason, False)
+        if repo['shard'] > 0:       # The next run builds on this catalog, so it must have every group
+            lprint ('Crawling every group (not %d) so the next run has all of the catalog' % repo['shard'], False)
+            repo['shard'] = 0
+
+def delta_apply(repo, catalog):
+    """ Bring the last run's catalog of <repo> up to date into <catalog>; ask artifactory which files were created,
+        modified or updated since the last run started (see aql_changes) and take everything else from the last run.
+        Returns False if there is nothing to bring up to date (see delta_open) or artifactory could not tell us, so
+        everything has to be crawled.
+
+        Files removed from artifactory since then (by anyone but the last run) are not seen, so the candidates are
+        verified before they are deleted, and everything is crawled again every INCREMENTAL_DAYS.
+    """
+
+    delta = repo['delta']
+    if delta is None or delta['state'] is None:     # Not an incremental crawl, or the last run can't be built on
+        return False
+
+    state = delta['state']
+    base  = delta.pop('catalog')    # Closed (a SQLite catalog) once we return; this crawl's takes its place
+    sizes = delta.pop('sizes')
+    lprint ('Asking %s for the files changed since %s' % (repo['name'], state['since']), False)
+    results = aql_changes(repo, state['since'])
+    if results is None:
+        lprint ('! Could not ask for the changed files .. crawling everything', False)
+        return False
+
+    # Each changed file, by group, as the list API would give it
+    changes = dict()
+    changed = set()
+    for r in results:
+        folder = '' if r['path'] in ['', '.'] else '/' + r['path'].strip('/')
+        stamp  = r['modified'] if USE_MODIFIED_TIME else r['created']
+        f      = {'uri': '/' + r['name'], 'lastModified': stamp, 'size': r.get('size')}
+        changed.add(repo['path'] + folder + f['uri'])
+        changes.setdefault(file_group(repo, repo['path'] + folder + f['uri']), list()).append((folder, f))
+
+    # What the last run deleted is still in its catalog; a folder (ends with '/') takes everything under it. They
+    # were saved as the delete requests were sent (see delete_uri).
+    deleted = sorted(state['deleted'])
+
+    def gone(uri):
+        uri = uri.replace('/api/storage', '')
+        n   = bisect.bisect_right(deleted, uri)
+        return n > 0 and (deleted[n - 1] == uri or (deleted[n - 1].endswith('/') and uri.startswith(deleted[n - 1])))
+
+    # Whatever was skipped is skipped again (a changed file is looked at again below)
+    skipped = set()
+    for msg in state['skipped']:
+        uri = msg.split(': ', 1)[1]
+        if uri not in changed and not gone(uri):
+            add_skipped(repo, msg)
+            skipped.add(msg)
+
+    groups = dict()             # The last run's entries that are still as they were, by group
+    for (k, v) in base.entries():
+        if k not in changed and not gone(k):
+            groups.setdefault(file_group(repo, k), list()).append((k, v))
+
+    reused = 0
+    skip_folders = set()        # Top most skipped folders the changed files are in
+    for g in sorted(set(groups) | set(changes)):
+        for (k, v) in groups.get(g, list()):
+            if k not in catalog:            # A resumed crawl already has it
+                add_entry(repo, catalog, k, v, sizes.get(k))
+                reused = reused + 1
+        for (folder, f) in changes.get(g, list()):
+            list_entry(repo, folder, f, catalog, skip_folders, None)
+        if repo['pipe'] is not None:        # Streaming; the group is complete, so the pipeline can decide it
+            pipe_put(repo, ('G', g))
+
+    for f in sorted(skip_folders):
+        if 'Skip Folder: ' + f not in skipped:
+            lprint ('! skipping folder: %s' % f, False)
+            add_skipped(repo, 'Skip Folder: ' + f)
+
+    lprint ('%d files changed since the last run, %d unchanged files taken from it' % (len(results), reused), False)
+    return True
+
+def aql_changes(repo, since):
+    """ Ask artifactory (an AQL search) for the files of <repo> created, modified or updated after <since> (UTC, ISO
+        8601). Returns the results (dicts of path, name, created, modified and size), or None if it could not tell us.
+    """
+
+    after = {'$gt': since}
+    query = 'items.find(%s).include("path","name","created","modified","size")' % json.dumps(
+            {'repo': repo['name'], 'type': 'file', '$or': [{'created': after}, {'modified': after}, {'updated': after}]})
+    uri   = BASE_PATH.rsplit('/api/storage', 1)[0] + '/api/search/aql'
+
+    try:
+        with request_slot():
+            resp = http_request('POST', uri, data=query, auth=repo['auth'], headers={'Content-Type': 'text/plain'})
+        if resp.status_code != 200:
+            lprint ('! AQL search of %s returned %d' % (repo['name'], resp.status_code), False)
+            return None
+        return resp.json()['results']
+    except (ValueError, KeyError, requests.exceptions.RequestException) as e:
+        lprint ('! AQL search of %s failed: %s' % (repo['name'], e), False)
+        return None
+
+def delta_close(repo, deleted):
+    """ Save what the next incremental run of <repo> needs besides its catalog; when this crawl started (less
+        DELTA_MARGIN, for any clock difference with artifactory), when the last full crawl did, the skip lists,
+        everything that was skipped (of every kind; the next run only looks at the files that changed) and the files
+        this run <deleted> (they are still in the saved catalog).
+    """
+
+    delta = repo['delta']
+    repo['delta'] = None
+    state = {'rules': delta_rules(repo), 'since': delta['since'], 'full': delta['full'], 'skipped': repo['skipped'],
+             'deleted': deleted}
+    with open(repo['delta_file'], 'w') as fo:
+        json.dump(state, fo)
+
+def delta_rules(repo):
+    """ The skip lists the catalog of <repo> is built with, as saved in its delta file """
+
+    return json.dumps([repo['skip_folders'], repo['skip_files']])
+
+def list_group(repo, folder, catalog):
+    """ run_pool function for list_repo: list a top level folder """
+
+    if not list_folder(repo, folder, True, catalog):
+        return False
+
+    if repo['pipe'] is not None:    # Streaming; the group is complete, so the pipeline can decide it
+        pipe_put(repo, ('G', folder))
+    return True
+
+def checkpoint_open(repo, catalog):
+    """ Start journaling the crawl of <repo> to its checkpoint file. With RESUME set, what an earlier (interrupted)
+        run left in the file is first replayed into <catalog> and the skipped list. Returns True if that crawl had
+        completed.
+
+        Each line of the journal is one record;
+          F|file|timestamp[|size]  catalog entry       S|text        skipped entry
+          Q|uri|0 or 1      queued file/folder  D|uri         file/folder done
+          L|folder          folder listed       E             crawl complete
+    """
+
+    file = repo['checkpoint']
+    ckpt = {'lock': threading.Lock(), 'queued': list(), 'done': set(), 'listed': set(), 'skipped': set(),
+            'complete': False, 'flushed': time.time()}
+
+    if RESUME and os.path.exists(file):
+        lprint ('Resuming from checkpoint "%s"' % file, False)
+        with open(file) as fi:
+            for line in fi:
+                if not line.endswith('\n'):     # Last record was cut off when the run died; ignore it
+                    break
+                (kind, sep, rest) = line[:-1].partition('|')
+                if kind == 'F':
+                    (k, v, size) = split_entry(rest)
+                    catalog[k] = v
+                    store_add(repo, k, v, size)
+                    if size is not None:
+                        add_size(repo, k, size)
+                elif kind == 'S' and rest not in ckpt['skipped']:
+                    ckpt['skipped'].add(rest)
+                    repo['skipped'].append(rest)
+                elif kind == 'Q':
+                    (k, sep, v) = rest.rpartition('|')
+                    ckpt['queued'].append((k, v == '1'))
+                elif kind == 'D':
+                    ckpt['done'].add(rest)
+                elif kind == 'L':
+                    ckpt['listed'].add(rest)
+                elif kind == 'E':
+                    ckpt['complete'] = True
+        lprint ('%d entries read from checkpoint' % len(catalog), False)
+        ckpt['file'] = open(file, 'a')          # Carry on where we left off
+    else:
+        ckpt['file'] = open(file, 'w')
+
+    repo['ckpt'] = ckpt
+    return ckpt['complete']
+
+def checkpoint(repo, *fields):
+    """ Add a record to <repo>'s checkpoint journal. The journal is flushed to disk every CHECKPOINT_SECS. """
+
+    ckpt = repo['ckpt']
+    if ckpt is None:
+        return
+
+    with ckpt['lock']:                          # Crawl workers all write to the same journal
+        ckpt['file'].write('|'.join(fields) + '\n')
+        if time.time() - ckpt['flushed'] >= CHECKPOINT_SECS:
+            ckpt['file'].flush()
+            os.fsync(ckpt['file'].fileno())
+            ckpt['flushed'] = time.time()
+
+def checkpoint_close(repo):
+    """ Mark <repo>'s crawl complete and close its checkpoint journal """
+
+    checkpoint(repo, 'E')
+    repo['ckpt']['file'].close()
+    repo['ckpt'] = None
+
+def add_entry(repo, catalog, file, timestamp, size=None, held=None):
+    """ Add a file (and its <size> in bytes, if we know it) to the catalog and the checkpoint journal. When streaming
+        it is sent down the pipeline too, or added to <held> (if given) for the caller to send once it no longer holds
+        a request slot.
+    """
+
+    catalog[file] = timestamp
+    store_add(repo, file, timestamp, size)
+    if size is None:
+        checkpoint(repo, 'F', file, timestamp)
+    else:
+        add_size(repo, file, size)
+        checkpoint(repo, 'F', file, timestamp, str(size))
+    record('entries', 1)
+
+    if repo['pipe'] is None:
+        return
+    if held is not None:
+        held.append(('F', file, timestamp))
+    else:                           # Streaming; the pipeline gets the file now (see drain)
+        pipe_put(repo, ('F', file, timestamp))
+
+def add_size(repo, file, size):
+    """ Record the <size> of <file> in <repo>. With EARLY_DELETE the file is also added to the files of its group, so a
+        folder candidate can be sized without going through every file of the repo (see group_keys).
+    """
+
+    repo['sizes'][file] = size
+    if EARLY_DELETE:
+        repo['groups'].setdefault(file_group(repo, file), list()).append(file)
+
+def add_skipped(repo, msg):
+    """ Add a message to the skipped list (and the checkpoint journal) unless a resumed crawl already has it """
+
+    ckpt = repo['ckpt']
+    if ckpt is not None and msg in ckpt['skipped']:
+        return
+
+    repo['skipped'].append(msg)
+    checkpoint(repo, 'S', msg)
+
+def traverse(repo, catalog, roots=None):
+    """ Crawl <repo> with a pool of WORKERS threads draining a bounded queue of folder/file URIs.
+        The crawl starts at the root of the repo (or this run's groups, see shard_select), or at the folder uris in
+        <roots>.
+    """
+
+    files = list()
+    if roots is None and repo['shard'] > 0:
+        # Only crawl this run's groups (and the files in the root)
+        base = collect_data(repo['path'])
+        if len(base) == 0 or 'children' not in base:
+            lprint ('! skipping null dict: %s' % repo['path'], False)
+            add_skipped(repo, 'Attention: ' + repo['path'])
+            return(catalog)
+        roots = [repo['path'] + g for g in shard_select(repo, base)]
+        files = [(repo['path'] + c['uri'], False) for c in base['children'] if not c['folder']]
+    elif roots is None:
+        roots = [repo['path']]
+
+    # When resuming, pick up whatever the interrupted crawl had queued but not finished (roots included)
+    items = [(uri, True) for uri in roots] + files
+    ckpt  = repo['ckpt']
+    if ckpt is not None:
+        seen  = set()
+        todo  = list()
+        for item in items + ckpt['queued']:
+            if item[0] not in ckpt['done'] and item not in seen:
+                seen.add(item)
+                todo.append(item)
+        items = todo
+        ckpt['queued'] = list()         # Don't need these any more
+    for (uri, folder) in items:
+        checkpoint(repo, 'Q', uri, '1' if folder else '0')
+
+    # Every item in the queue is a (uri, is_folder) pair. The crawl starts at the root(s) and each worker puts the
+    # children of the folders it fetches back on the queue, so we have up to WORKERS requests in flight instead of
+    # waiting on one at a time.
+    work = Queue.LifoQueue(QUEUE_SIZE)  # LIFO keeps the crawl depth first (and the queue small); siblings last first
+
+    lprint ('Crawling %s with %d workers (%d folders/files queued)' % (repo['path'], WORKERS, len(items)), False)
+    threads = list()
+    for n in range(max(WORKERS, 1)):
+        t = threading.Thread(target=crawl_worker, args=(repo, work, catalog))
+        t.daemon = True         # Never let a stuck worker keep the script alive
+        t.start()
+        threads.append(t)
+
+    # The workers are already draining the queue, so a resumed crawl (or a shard) with more items than the queue
+    # holds just waits for room here instead of blocking forever
+    for item in items:
+        work.put(item)
+
+    work.join()                 # Wait until every queued folder/file has been processed
+    for t in threads:           # Then tell the workers to exit (one 'None' each)
+        work.put(None)
+    for t in threads:
+        t.join()
+
+    return(catalog)
+
+def crawl_worker(repo, work, catalog):
+    """ Worker thread: process items from the work queue until told to stop (a None item) """
+
+    while True:
+        item = work.get()
+        if item is None:        # traverse() is done with us
+            work.task_done()
+            return
+
+        # Children that don't fit in the shared queue are kept on a private stack and processed by this worker
+        # (depth first) so a full queue can never dead-lock the workers. Like the shared LIFO queue, the stack hands
+        # siblings out last first, so even with one worker the crawl order is not the old traverse's (the catalog
+        # is the same once sorted).
+        pending = [item]
+        while pending:
+            (uri, folder) = pending.pop()
+            try:
+                children = crawl_node(repo, uri, folder, catalog)
+            except:                                 # Don't let one bad node kill the worker (and hang the crawl)
+                lprint ('! Unknown ERROR: Sys: %s (%s)' % (sys.exc_info()[0], uri), False)
+                add_skipped(repo, 'Attention: ' + uri)
+                continue
+
+            for child in children:
+                checkpoint(repo, 'Q', child[0], '1' if child[1] else '0')
+            checkpoint(repo, 'D', uri)          # Only now is this node done (its children are in the journal)
+
+            for child in children:
+                try:
+                    work.put_nowait(child)
+                except Queue.Full:
+                    pending.append(child)
+
+        work.task_done()
+
+def count_collected(repo):
+    """ Count one more file/folder collected. Returns False once <repo>'s 'max_files' has been reached """
+
+    with repo['count_lock']:        # Every worker updates the counter
+        if repo['max_files'] > 0 and repo['collected'] >= repo['max_files']:
+            show = not repo['max_shown']    # Message has not been displayed yet.
+            repo['max_shown'] = True        # Set to True to indicate I displayed the message
+        else:
+            repo['collected'] = repo['collected'] + 1
+            return True
+
+    if show:
+        lprint('Collected %d files .. exitting' % repo['collected'], True)
+    return False
+
+def crawl_node(repo, uri, folder, catalog):
+    """ Process one folder/file uri. Returns a list of (uri, is_folder) children that still need processing. """
+
+    # Once we hit the 'max_files' threshold the workers simply drain what is left in the queue
+    if uri != repo['path'] and not count_collected(repo):
+        return []
+
+    if not folder:
+        # If a file name contains "DO_NOT_DELETE" (or some variant thereof), or is in the skip list, skip it. The
+        # name is all we need, so check it before spending a request on the file.
+        file_name = '/' + uri.split('/')[-1]
+        if skip_file(repo, file_name):
+            lprint ('! skipping file: %s' % file_name, False)    # Show file (only) for readability
+            add_skipped(repo, 'Skip File: ' + uri)                      # Save full path
+            return []
+
+    new_data = collect_data(uri, repo['immutable'])     # Get data on this folder/file
+
+    if folder:
+        # If nothing is returned that's an issue. Add it to the 'skip' list and log it as needing "Attention"
+        if len(new_data) == 0 or 'children' not in new_data:
+            lprint ('! skipping null dict: %s' % uri, False)
+            add_skipped(repo, 'Attention: ' + uri)
+            return []
+
+        # Create the full path of each child. Folders will be crawled deeper; files get their date looked up.
+        children = list()
+        for c in new_data['children']:
+            # See if this folder is in the repo's skip list. We know from its path alone, so a skipped folder (and
+            # everything under it) is never fetched.
+            if c['folder'] and skip_folder(repo, new_data['path'].rstrip('/') + c['uri']):
+                lprint ('! skipping folder: %s' % (uri + c['uri']), False)
+                add_skipped(repo, 'Skip Folder: ' + uri + c['uri'])
+                continue
+            children.append((uri + c['uri'], c['folder']))
+
+        return children
+
+    # If here this is a file, so new_data contains the date info we need
+    file = uri                              # Save full path to <file>
+
+    # In some cases artifactory returns no date info and I haven't been able to figure out why. It seems
+    # to occur on files with spaces and/or parenthesis in the file name. In any case, until I figure it
+    # out, I will mark the file as 'skipped'.
+    if len(new_data) == 0:
+        lprint ('! ignore: no date found (%s)' % file, False)
+        if repo['clean']:                   # Only matters for the repo we clean
+            lprint ('! skipping null date: %s' % file.split('/')[-1], False)   # Show file (only) for readability
+            add_skipped(repo, 'Null date: ' + file)
+    else:
+        # I think we should be using the lastModified date instead of created date. Some files have a
+        # created date of years ago (package.json) while its lastModified date is within a day of current date
+        if USE_MODIFIED_TIME:
+            stamp = new_data['lastModified']   # Save modified date with <file> as key
+        else:
+            stamp = new_data['created']        # Save created date with <file> as key
+        size = new_data.get('size')            # The storage API sends the size as a string
+        add_entry(repo, catalog, file, stamp, int(size) if size is not None else None)
+
+    return []
+
+def shard_select(repo, base):
+    """ Return the top level folders (groups) of the repo root <base> this run crawls; the repo's 'shard' groups that
+        follow the one the last run ended with (saved in its 'cursor' file), wrapping around to the first. Every
+        group, if 'shard' is 0. Skipped groups are never crawled.
+    """
+
+    groups = list()
+    for c in sorted(base['children'], key=lambda c: c['uri']):
+        if not c['folder']:
+            continue
+        if skip_folder(repo, c['uri']):     # Skipped folders are never crawled
+            lprint ('! skipping folder: %s' % (repo['path'] + c['uri']), False)
+            add_skipped(repo, 'Skip Folder: ' + repo['path'] + c['uri'])
+            continue
+        groups.append(c['uri'])
+
+    shard = repo['shard']
+    if shard <= 0 or len(groups) <= shard:
+        return groups
+
+    cursor = ''
+    if os.path.exists(repo['cursor']):
+        with open(repo['cursor']) as cf:
+            cursor = cf.read().strip()
+
+    n      = bisect.bisect_right(groups, cursor)    # The first group after the cursor (the cursor may be gone by now)
+    groups = groups[n:] + groups[:n]
+    repo['shard_cursor'] = groups[shard - 1]
+    lprint ('Crawling %d of %d groups this run (%s .. %s)' % (shard, len(groups), groups[0], repo['shard_cursor']), False)
+
+    return groups[:shard]
+
+def list_repo(repo, catalog):
+    """ Build a repo catalog from artifactory's file list API; one deep listing per top level folder instead of one
+        request per folder and file. traverse() is only used for whatever the list API could not give us.
+    """
+
+    # The list API only returns the lastModified date, so we have to crawl if we were asked for the created date
+    if not USE_MODIFIED_TIME:
+        lprint ('List API has no created date .. crawling instead', False)
+        return traverse(repo, catalog)
+
+    lprint ('Listing %s with %d workers' % (repo['path'], WORKERS), False)
+    base = collect_data(repo['path'])                           # The root folder; its children are what we list
+    if len(base) == 0 or 'children' not in base:
+        lprint ('! Could not list %s .. crawling instead' % repo['path'], False)
+        return traverse(repo, catalog)
+
+    groups = shard_select(repo, base)
+
+    if not list_folder(repo, '', False, catalog):
+        lprint ('! Could not list %s .. crawling instead' % repo['path'], False)
+        return traverse(repo, catalog)
+
+    listed = set()                          # Folders a resumed crawl has already listed
+    if repo['ckpt'] is not None:
+        listed = repo['ckpt']['listed']
+
+    # Files in the root were picked up by the shallow listing above
+    folders = [g for g in groups if g not in listed]
+
+    # List the top level folders concurrently. Anything the list API fails on is crawled the old way.
+    failed = run_pool(lambda f: list_group(repo, f, catalog), folders)
+    if len(failed) > 0:
+        lprint ('! Could not list %d folders .. crawling them instead' % len(failed), False)
+        traverse(repo, catalog, [repo['path'] + f for f in failed])
+
+    return(catalog)
+
+def list_folder(repo, folder, deep, catalog):
+    """ Add every file under <folder> to the catalog using the list API. Returns False if the listing failed. """
+
+    uri = repo['path'] + folder + '?list&listFolders=0&mdTimestamps=0&deep=%d' % (1 if deep else 0)
+
+    skip_folders = set()                    # Top most skipped folders seen in this listing
+    held         = list()                   # Files for the pipeline; the listing holds a request slot until it is read
+    try:
+        try:
+            for f in stream_list(uri):      # Entries are handled as they are decoded, not once the listing is done
+                if not list_entry(repo, folder, f, catalog, skip_folders, held):
+                    break                   # Hit the 'max_files' threshold
+        finally:
+            for item in held:
+                pipe_put(repo, item)
+    except (ValueError, requests.exceptions.RequestException) as e:
+        lprint ('! Could not list %s: %s' % (uri, e), False)
+        return False
+
+    for f in sorted(skip_folders):
+        lprint ('! skipping folder: %s' % f, False)
+        add_skipped(repo, 'Skip Folder: ' + f)
+
+    if deep:
+        checkpoint(repo, 'L', folder)       # All of this folder is in the journal
+    return True
+
+def list_entry(repo, folder, f, catalog, skip_folders, held):
+    """ Add one list API entry <f> (found under <folder>) to the catalog (and <held>, see add_entry). Returns False once
+        we have enough files.
+    """
+
+    path = folder + f['uri']            # Path of the file from the root of the repo
+    file = repo['path'] + path          # Save full path to <file> (same key traverse uses)
+
+    # The listing is flat, so a file is skipped if any folder it lives in is in the skip list
+    skip = skip_folder(repo, path[:path.rindex('/')])
+    if skip:
+        skip_folders.add(repo['path'] + skip)
+        return True
+
+    # If a file name contains "DO_NOT_DELETE" (or some variant thereof), or is in the skip list, skip it
+    file_name = path[path.rindex('/'):]
+    if skip_file(repo, file_name):
+        lprint ('! skipping file: %s' % file_name, False)    # Show file (only) for readability
+        add_skipped(repo, 'Skip File: ' + file)                     # Save full path
+        return True
+
+    if not count_collected(repo):       # Hit the 'max_files' threshold
+        return False
+
+    add_entry(repo, catalog, file, f['lastModified'], f.get('size'), held)  # Save modified date with <file> as key
+
+    return True
+
+def scan_repo(repo, catalog):
+    """ Build a repo catalog from its local copy under LOCAL_REPOS (a backup, such as the one on devartifactory1)
+        instead of asking artifactory. The top level folders are scanned concurrently by WORKERS threads; all of
+        them, since a scan costs artifactory nothing. Each file is cataloged under the artifactory URI it maps to,
+        with its modified time as the timestamp (see local_stamp).
+    """
+
+    root = local_path(repo, '')
+    if scandir is None:
+        lprint ('* Warning: scanning a local repo needs python 3.5+ or the scandir package .. exiting', False, WARNING)
+        sys.exit(1)
+    if not os.path.isdir(root):
+        lprint ('* Warning: no local copy of %s in %s .. exiting' % (repo['path'], root), False, WARNING)
+        sys.exit(1)
+
+    lprint ('Scanning %s (for %s) with %d workers' % (root, repo['path'], WORKERS), False)
+    folders = scan_folder(repo, '', False, catalog)     # Files in the root, and the folders to scan
+    failed  = run_pool(lambda f: scan_folder(repo, f, True, catalog), folders)
+    if len(failed) > 0:
+        lprint ('! Could not scan %d folders' % len(failed), False)
+
+    return(catalog)
+
+def scan_folder(repo, folder, deep, catalog):
+    """ Add the files in local folder <folder> (a path from the root of the repo, like the list API's) to the
+        catalog, and with <deep> those in all the folders under it. Returns the folders found when not <deep>.
+    """
+
+    found = list()
+    todo  = [folder]
+    while len(todo) > 0:
+        folder = todo.pop()
+        try:
+            entries = list(scandir(local_path(repo, folder)))
+        except OSError as e:
+            lprint ('! Could not scan %s: %s' % (local_path(repo, folder), e), False)
+            add_skipped(repo, 'Attention: ' + repo['path'] + folder)
+            continue
+
+        for e in entries:
+            path = folder + '/' + e.name    # Path from the root of the repo
+            if e.is_dir(follow_symlinks=False):
+                if e.name in LOCAL_IGNORE:
+                    continue
+                if skip_folder(repo, path): # Skipped folders are never scanned
+                    lprint ('! skipping folder: %s' % (repo['path'] + path), False)
+                    add_skipped(repo, 'Skip Folder: ' + repo['path'] + path)
+                elif deep:
+                    todo.append(path)
+                else:
+                    found.append(path)
+            elif e.is_file(follow_symlinks=False):
+                # If a file name contains "DO_NOT_DELETE" (or some variant thereof), or is in the skip list, skip it
+                if skip_file(repo, '/' + e.name):
+                    lprint ('! skipping file: /%s' % e.name, False)       # Show file (only) for readability
+                    add_skipped(repo, 'Skip File: ' + repo['path'] + path)
+                    continue
+                if not count_collected(repo):   # Hit the 'max_files' threshold
+                    return found
+                st = e.stat()
+                add_entry(repo, catalog, repo['path'] + path, local_stamp(st.st_mtime), st.st_size)
+
+    return found
+
+def local_path(repo, path):
+    """ Map a repo path (such as "/@scope/pkg/-/pkg-1.0.0.tgz") of <repo> to its local copy under LOCAL_REPOS.
+        The local copy is in a folder named after the repo, and mirrors the repo's folders.
+    """
+
+    return os.path.join(LOCAL_REPOS, repo['name']) + path.replace('/', os.sep)
+
+def local_stamp(mtime):
+    """ Return a file modified time (seconds since the epoch) as an artifactory (ISO 8601, UTC) timestamp """
+
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(mtime)) + '.%03d+00:00' % (mtime % 1 * 1000)
+
+def compile_rules(rules):
+    """ Compile a skip list into one regex (None if the list is empty), so a path is matched with a single search
+        instead of joining and compiling the list every time. Each rule is one of;
+          text          the path contains <text> (how the skip lists have always worked)
+          prefix:text   the path, from the root of the repo, starts with <text>
+          glob:pattern  a folder/file name in the path matches the shell <pattern> (*, ? and [...])
+          re:pattern    the path matches the regular expression <pattern>
+    """
+
+    alts = list()
+    for rule in rules:
+        rule = rule.strip()
+        if rule.startswith('prefix:'):
+            alts.append('^/?' + re.escape(rule[len('prefix:'):].lstrip('/')))
+        elif rule.startswith('glob:'):
+            alts.append('(?:^|/)' + glob_pattern(rule[len('glob:'):]) + '(?=/|$)')
+        elif rule.startswith('re:'):
+            alts.append(rule[len('re:'):])
+        elif rule:
+            alts.append(re.escape(rule))
+
+    if len(alts) == 0:
+        return None
+
+    return re.compile('|'.join('(?:%s)' % a for a in alts))
+
+def glob_pattern(glob):
+    """ Translate a shell pattern into a regex that never matches past the folder/file name it is in """
+
+    regex = ''
+    n     = 0
+    while n < len(glob):
+        c = glob[n]
+        if c == '*':
+            regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '[' and glob.find(']', n + 2) > 0:    # A set of chars ("[!...]" is any char not in the set)
+            end   = glob.find(']', n + 2)
+            chars = glob[n + 1:end].replace('\\', '\\\\')
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            regex += '[' + chars + ']'
+            n = end
+        else:
+            regex += re.escape(c)
+        n += 1
+
+    return regex
+
+def skip_file(repo, name):
+    """ True if the file <name> matches <repo>'s file skip list """
+
+    return repo['file_rules'] is not None and repo['file_rules'].search(name) is not None
+
+def skip_folder(repo, path):
+    """ Return the top most folder in <path> that matches <repo>'s folder skip list, or None if nothing matches """
+
+    rules = repo['folder_rules']
+    if rules is None or not rules.search(path):
+        return None
+
+    # A folder's path contains its parent's path, so walk down from the top to find the first one that matches
+    parts = path.strip('/').split('/')
+    for n in range(1, len(parts) + 1):
+        folder = '/' + '/'.join(parts[:n])
+        if rules.search(folder):
+            return folder
+
+    return path
+
+def run_pool(func, items):
+    """ Call func(item) for each item using WORKERS threads. Returns the items func failed (returned False) on. """
+
+    pool = pool_start(func, min(WORKERS, len(items)))
+    for item in items:
+        pool['work'].put(item)
+
+    return pool_finish(pool)
+
+def pool_start(func, workers=None):
+    """ Start <workers> (WORKERS by default) threads calling func(item) for each item put on the returned pool's
+        'work' queue, for when the items are not all known up front (see emit). pool_finish waits for them.
+    """
+
+    if workers is None:
+        workers = WORKERS
+
+    pool = {'work': Queue.Queue(), 'failed': list(), 'threads': list()}
+    for n in range(max(workers, 1)):
+        t = threading.Thread(target=pool_worker, args=(func, pool['work'], pool['failed']))
+        t.daemon = True         # Never let a stuck worker keep the script alive
+        t.start()
+        pool['threads'].append(t)
+
+    return pool
+
+def pool_finish(pool):
+    """ Wait for the pool's workers to process everything put on it. Returns the items func failed on. """
+
+    for t in pool['threads']:   # One "stop" for each worker, behind the last item
+        pool['work'].put(None)
+    for t in pool['threads']:
+        t.join()
+
+    return pool['failed']
+
+def pool_worker(func, work, failed):
+    """ Worker thread for pool_start: process items until told to stop (a None item) """
+
+    while True:
+        item = work.get()
+        if item is None:
+            return
+
+        try:
+            if func(item) == False:
+                failed.append(item)
+        except:                         # Don't let one bad item kill the worker
+            lprint ('! Unknown ERROR: Sys: %s (%s)' % (sys.exc_info()[0], item), False)
+            failed.append(item)
+
+class Catalog(dict):
+    """ A catalog in memory; file: timestamp. It answers the queries a saved SQLite catalog does (see DbCatalog), so
+        nothing using a catalog needs to know which kind it has.
+    """
+
+    keys_sorted = None          # The files, sorted for under(); sorted again once files have been added
+
+    def entries(self):
+        """ The (file, timestamp) entries, sorted by file """
+
+        return sorted(self.iteritems())
+
+    def under(self, prefix):
+        """ The files whose path starts with <prefix>, sorted """
+
+        keys = self.keys_sorted
+        if keys is None or len(keys) != len(self):
+            keys = self.keys_sorted = sorted(self)
+
+        found = list()
+        n     = bisect.bisect_left(keys, prefix)
+        while n < len(keys) and keys[n].startswith(prefix):
+            found.append(keys[n])
+            n = n + 1
+
+        return found
+
+    def older(self, days):
+        """ The files more than <days> days old """
+
+        return [k for (k, v) in self.iteritems() if file_age(v) > days]
+
+class DbCatalog(collections.Mapping):
+    """ A catalog saved in SQLite (see db_load), read like the dict it was saved from; file: <column> ('timestamp', or
+        'size' for its sizes). A lookup is a query on the primary key, and under() and older() are range queries on
+        the path and the (indexed) day, so the catalog is never read into memory.
+    """
+
+    def __init__(self, db, lock, column):
+        self.db     = db
+        self.lock   = lock          # The catalog and its sizes share the connection, and many threads ask
+        self.column = column
+
+    def rows(self, sql, args=()):
+        """ Generator: the rows of query <sql> (with %(c)s for the column), fetched STORE_BATCH at a time """
+
+        with self.lock:
+            cursor = self.db.execute(sql % {'c': self.column}, args)
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(STORE_BATCH)
+            if len(rows) == 0:
+                return
+            for r in rows:
+                yield r
+
+    def __getitem__(self, path):
+        for (v,) in self.rows('SELECT %(c)s FROM catalog WHERE path = ? AND %(c)s IS NOT NULL', (path,)):
+            return v
+        raise KeyError(path)
+
+    def __contains__(self, path):
+        for r in self.rows('SELECT 1 FROM catalog WHERE path = ? AND %(c)s IS NOT NULL', (path,)):
+            return True
+        return False
+
+    def __len__(self):
+        for (n,) in self.rows('SELECT COUNT(*) FROM catalog WHERE %(c)s IS NOT NULL'):
+            return n
+
+    def __iter__(self):
+        for (k,) in self.rows('SELECT path FROM catalog WHERE %(c)s IS NOT NULL ORDER BY path'):
+            yield k
+
+    def entries(self):
+        """ Generator: the (file, value) entries, sorted by file """
+
+        return self.rows('SELECT path, %(c)s FROM catalog WHERE %(c)s IS NOT NULL ORDER BY path')
+
+    iteritems = entries
+
+    def under(self, prefix):
+        """ The files whose path starts with <prefix>, sorted """
+
+        # They all sort between <prefix> and <prefix> with its last character one higher, so the primary key finds them
+        upper = prefix[:-1] + unichr(ord(prefix[-1]) + 1)
+        return [k for (k,) in self.rows('SELECT path FROM catalog WHERE path >= ? AND path < ? AND %(c)s IS NOT NULL '
+                                        'ORDER BY path', (prefix, upper))]
+
+    def older(self, days):
+        """ The files more than <days> days old """
+
+        return [k for (k,) in self.rows('SELECT path FROM catalog WHERE day < ? AND %(c)s IS NOT NULL ORDER BY path',
+                                        (TODAY - days,))]
+
+def store_open(repo):
+    """ Start saving the catalog of <repo> as it is crawled (see store_add); to a temporary file, which takes the place
+        of the last run's catalog once the crawl is done (see store_close). How is up to the repo's store (STORES).
+    """
+
+    store = {'file': repo['catalog'] + '.new', 'lock': threading.Lock(), 'rows': list(), 'db': None}
+    if os.path.exists(store['file']):           # Left by a crawl that never finished
+        os.remove(store['file'])
+    STORES[repo['format']]['open'](store)
+    repo['store'] = store
+
+def store_add(repo, file, timestamp, size):
+    """ Add a catalog entry of <repo> (see add_entry) to the catalog being saved """
+
+    if repo['store'] is not None:
+        STORES[repo['format']]['add'](repo['store'], file, timestamp, size)
+
+def store_close(repo, catalog):
+    """ Finish saving the <catalog> of <repo> and put it in place of the last run's """
+
+    lprint ('Saving catalog "%s"' % repo['catalog'], False)
+    store = repo['store']
+    repo['store'] = None
+    STORES[repo['format']]['close'](store, catalog, repo['sizes'])
+    os.rename(store['file'], repo['catalog'])
+
+def store_load(repo):
+    """ Return the catalog the last run of <repo> saved, and its sizes (a Catalog and dict, or DbCatalogs that look
+        the files up in the database instead of reading all of it).
+    """
+
+    file = repo['catalog']
+    lprint ('Reading "%s"' % file, False)
+    if not os.path.exists(file):
+        lprint ('"%s" not found! (try running w/o "-g" option) .. exiting' % file, False)
+        sys.exit(1)
+
+    return STORES[repo['format']]['load'](file)
+
+def txt_open(store):
+    """ Text store: nothing to do; the lines are sorted, so they are written once the crawl is done (see txt_close) """
+
+def txt_add(store, file, timestamp, size):
+    """ Text store: see txt_open """
+
+def txt_close(store, catalog, sizes):
+    """ Text store: write the <catalog>, a file|timestamp|size line per file (the size if we know it) """
+
+    with open(store['file'], 'w') as fo:        # Open <file> for 'write'
+        for k in sorted(catalog):               # Loop through the catalog
+            size = sizes.get(k)
+            if size is None:
+                fo.write('%s|%s\n' % (k, catalog[k]))  # Write file name | timestamp
+            else:
+                fo.write('%s|%s|%d\n' % (k, catalog[k], size))     # .. | size
+
+def txt_load(file):
+    """ Text store: read the saved catalog <file> (a K|V or K|V|size line per file). Returns (Catalog, sizes). """
+
+    catalog = Catalog()
+    sizes   = dict()
+
+    # Process each line into a dictionary key value pair and populate a new dict (to return)
+    with open(file) as fi:
+        for x in fi:
+            x = x.strip()   # Remove trailing white space and new line char
+
+            (k, v, size) = split_entry(x)
+            if k is None:   # There should be a key and a value. If not that's an issue, so skip it
+                lprint ('  "%s" does not have two fields .. skipping' % x, False)
+                continue
+
+            catalog[k] = v  # Save in a dictionary
+            if size is not None:
+                sizes[k] = size
+
+    return (catalog, sizes)
+
+def db_open(store):
+    """ SQLite store: create the catalog table. The rows are added as the crawl finds the files (see db_add). """
+
+    db = sqlite3.connect(store['file'], check_same_thread=False)    # Every crawl worker adds to it
+    db.execute('PRAGMA journal_mode = OFF')     # An unfinished catalog is thrown away, so there is nothing to roll back
+    db.execute('PRAGMA synchronous = OFF')
+    db.execute('CREATE TABLE catalog (path TEXT PRIMARY KEY, timestamp TEXT, day INTEGER, size INTEGER)')
+    store['db'] = db
+
+def db_add(store, file, timestamp, size):
+    """ SQLite store: add a row, with the UTC day number of its timestamp for age queries (see DbCatalog.older). They
+        are inserted STORE_BATCH at a time.
+    """
+
+    with store['lock']:
+        store['rows'].append((file, timestamp, TODAY - file_age(timestamp), size))
+        if len(store['rows']) >= STORE_BATCH:
+            db_flush(store)
+
+def db_flush(store):
+    """ SQLite store: insert the rows added so far (the caller holds the store's lock) """
+
+    # A file seen again (a resumed crawl, or a changed file of an incremental one) replaces its row
+    store['db'].executemany('INSERT OR REPLACE INTO catalog VALUES (?, ?, ?, ?)', store['rows'])
+    store['rows'] = list()
+
+def db_close(store, catalog, sizes):
+    """ SQLite store: insert the rows left and index the days (cheaper once the rows are all in) """
+
+    with store['lock']:
+        db_flush(store)
+    db = store['db']
+    db.execute('CREATE INDEX catalog_day ON catalog (day)')
+    db.commit()
+    db.close()
+
+def db_load(file):
+    """ SQLite store: the catalog (and sizes) in database <file>, as DbCatalogs. A catalog saved before the days were
+        kept can't answer age queries, so it is read into a Catalog (and sizes) instead.
+    """
+
+    db      = sqlite3.connect(file, check_same_thread=False)   # The verify workers look files up too
+    columns = [c[1] for c in db.execute('PRAGMA table_info(catalog)')]
+    if 'day' in columns:
+        lock = threading.Lock()
+        return (DbCatalog(db, lock, 'timestamp'), DbCatalog(db, lock, 'size'))
+
+    catalog = Catalog()
+    sizes   = dict()
+    for (k, v, size) in db.execute('SELECT path, timestamp, %s FROM catalog' % ('size' if 'size' in columns else 'NULL')):
+        catalog[k] = v
+        if size is not None:
+            sizes[k] = size
+    db.close()
+
+    return (catalog, sizes)
+
+# The catalog stores (CATALOG_FORMAT); the file extension and functions of each (see store_open and store_load)
+STORES = {'txt':    {'ext': '.txt', 'open': txt_open, 'add': txt_add, 'close': txt_close, 'load': txt_load},
+          'sqlite': {'ext': '.db',  'open': db_open,  'add': db_add,  'close': db_close,  'load': db_load}}
+
+def split_entry(line):
+    """ Split a saved catalog line (or checkpoint record) "file|timestamp[|size]" into (file, timestamp, size). size is
+        None if the line has none, and file is None if the line is not an entry.
+    """
+
+    # The value (a timestamp) never has a '|' but some paths do, so split on the last one. A size is all digits (a
+    # timestamp never is), so a last field like that is the size.
+    (k, sep, v) = line.rpartition('|')
+    if not sep:
+        return (None, None, None)
+
+    size = None
+    if v.isdigit() and '|' in k:
+        size = int(v)
+        (k, sep, v) = k.rpartition('|')
+
+    return (k, v, size)
+
+# For debugging, no need to log this output via lprint
+def show_catalog(cat):
+    """ Show the catalog's dictionary """
+
+    print '\nDisplay catalog, %d entries..' % len(cat)
+    raw_input('Press Enter when ready to view')
+    for k in sorted(cat):
+        print '%9s :: %s' % (cat[k], k)
+
+def write_list(run, kind, lst):
+    """ Write a list to the <run>'s <kind> list file """
+
+    file_ptr = open_list(run, kind)
+    for k in sorted(lst):
+        file_ptr.write('%s\n' % k)
+    file_ptr.close()
+
+def open_list(run, kind):
+    """ Open the <run>'s <kind> list file for writing, and write its header. Returns the open file. """
+
+    file = run['lists'][kind]
+    lprint ('Writing list to %s' % file, False)
+    file_ptr = open(file, 'w')
+
+    # Since we sort the list when we write I can't merely insert these comments into the list. I must write them to
+    # the file, then the sorted data is written behind it.
+    lines = run['policy'].list_header(kind)
+    if lines is None:
+        lines = list_header(run, kind)
+    if lines:
+        file_ptr.write("%s\n" % HEADER2)
+        for line in lines:
+            file_ptr.write(("# %s" % line).rstrip() + "\n")
+        file_ptr.write("%s\n" % HEADER2)
+
+    return file_ptr
+
+def list_header(run, kind):
+    """ The header (comment lines) of the list files every policy has """
+
+    target = run['target']
+    if kind == 'skipped':
+        return ["These files were skipped (will not be removed) due to one or more of the following ..",
+                "1) There was an issue processing the file date",
+                "2) The file matches one of these names..",
+                "     %s" % ', '.join(target['skip_files']),
+                "",
+                "3) The folder matches one of these names..",
+                "     %s" % ', '.join(target['skip_folders']),
+                ""]
+    elif kind == 'failed':
+        return ["These files could not be deleted (see the log for the status artifactory returned)"]
+    elif kind == 'drift':
+        return ["These files/folders were marked for deletion but were not deleted; artifactory no longer has them as",
+                "they were cataloged (the reason follows each one)"]
+    elif kind == 'projected':
+        return ["Dry run; what deleting the candidates still in artifactory would free, by group (top level folder)",
+                "bytes, candidates, group; the biggest first"]
+
+    return None
+
+def clean(run, u, p):
+    """ Catalog the repos of <run>, let its policy decide what to do with each file of the repo it cleans (the last
+        one), and write that out (and maybe delete them).
+    """
+
+    policy  = run['policy']
+    target  = run['target']
+    catalog = Catalog()
+    target['auth'] = (u, p)     # An incremental crawl asks artifactory what has changed (see aql_changes)
+
+    # I could process the data w/o saving it but the data is useful for debugging and running multiple times
+    # without having to constantly send requests to artifactory
+    crawl = None
+    if GEN_SAVED_DATA:  # Scan the artifactory folders and save the data for re-use
+        # The other repos are crawled alongside the one we clean; they share the request slots (see slot_acquire)
+        others = crawl_others(run)
+
+        lprint ('\nGenerating %s catalog\n%s' % (target['name'], HEADER1), False)
+        if STREAM:      # The files are decided (below) while they are being crawled
+            # Every file is checked against the whole of the other repos' catalogs, so the pipeline can't start until
+            # they are done. Until then the crawl must not wait on it; it is bounded once they are.
+            (pipe, crawl) = stream_catalog(target, catalog, 0 if others else QUEUE_SIZE)
+            batches = drain(target, pipe, policy.GROUPS)
+        else:
+            build_catalog(target, catalog)
+            batches = [catalog.entries()]
+        wait_others(run, others)
+        if STREAM and others:       # Nothing else needs the request slots now, so the pipe can hold the crawl up
+            target['pipe_size'] = QUEUE_SIZE
+    else:               # Don't scan artifactory, use data from previous run
+        lprint ('Using saved data', False)
+        for repo in run['repos'][:-1]:
+            (run['catalogs'][repo['name']], repo['sizes']) = store_load(repo)
+            lprint ('%d files read from %s' % (len(run['catalogs'][repo['name']]), repo['catalog']), False)
+        (catalog, target['sizes']) = store_load(target)
+        lprint ('%d files read from %s (%d older than %d days)' % (len(catalog), target['catalog'],
+                len(catalog.older(MAX_DAYS)), MAX_DAYS), True)
+        batches = [catalog.entries()]
+    run['catalogs'][target['name']] = catalog
+
+    # Each file flows through the policy's classify() and is written out (maybe deleted) by emit() as soon as it is
+    # decided
+    counts = emit(run, policy.classify(batches, run), catalog, u, p)
+    run['counts'] = counts
+
+    if crawl is not None:
+        crawl.join()
+    if GEN_SAVED_DATA:
+        store_close(target, catalog)
+        CATALOGS[(target['path'], delta_rules(target))] = catalog
+
+    skipped = list()
+    for repo in run['repos']:
+        skipped.extend(repo['skipped'])
+    skipped.extend(run['skipped'])
+
+    lprint ('', False)
+    for repo in run['repos']:
+        lprint('%4d entries in %s repo' % (len(run['catalogs'][repo['name']]), repo['name']), False)
+    lprint('%4d entries skipped (from the skip lists)' % len(skipped), False)
+    for (kind, label) in policy.COUNTS:
+        lprint('%4d entries %s' % (counts[kind], label), False)
+    lprint ('', False)
+
+    # Save the processed data for review, if need be. (emit already wrote the other lists)
+    start = time.time()
+    write_list(run, 'skipped', skipped)
+    add_phase('write', start, len(skipped), run)
+    lprint ('', False)
+
+    # Here we finally do something with the files we collected.
+    if DRY_RUN:         # Check the candidates and report what deleting them would free
+        with open(run['lists']['delete']) as fi:
+            files = [x.strip() for x in fi if not x.startswith('#')]
+        simulate_deletes(run, files, catalog, u, p)
+    elif not DO_DELETE: # User did not issue DO_DELETE option, so print a messge and move on
+        lprint ('File deletion skipped', False)
+    elif EARLY_DELETE and not INTERACTIVE and not DELETE_ONE:
+        lprint ('Files were deleted as they were decided', False)
+    else:               # User did say they want to delete the files so call that function here
+        with open(run['lists']['delete']) as fi:
+            files = [x.strip() for x in fi if not x.startswith('#')]
+        files = plan_deletes(run, files)    # Most space freed first (and only as many as RECLAIM_GB needs)
+        if VERIFY:      # Make sure artifactory still has them as we cataloged them
+            start = time.time()
+            total = len(files)
+            files = verify_candidates(run, files, catalog)
+            add_phase('verify', start, total, run)
+        start = time.time()
+        delete_files(run, files, u, p)
+        add_phase('delete', start, len(files), run)
+
+    lprint ('', False)
+
+    # The next incremental run builds on this one's catalog
+    if target['delta'] is not None:
+        delta_close(target, run['deleted'])
+
+    # The job finished, so there is no crawl left to resume
+    for repo in run['repos']:
+        if os.path.exists(repo['checkpoint']):
+            os.remove(repo['checkpoint'])
+
+        # and this run's groups are done; the next run starts with the group after them
+        if repo['shard_cursor'] is not None:
+            with open(repo['cursor'], 'w') as cf:
+                cf.write(repo['shard_cursor'] + '\n')
+
+def emit(run, decisions, catalog, u, p):
+    """ Pipeline sink: write each (list, file or folder) decision to its list file as it comes in, so nothing is held
+        until the end (skipped files still go to the skipped list). With EARLY_DELETE set, whatever is marked for
+        deletion goes straight to the delete workers (which verify it against <catalog> first). Returns how many
+        files/folders went to each list.
+    """
+
+    outs   = dict()
+    counts = dict()
+    for kind in run['policy'].LISTS:
+        if kind != 'skipped':       # Written once the crawl's skipped folders are all in (see clean)
+            outs[kind] = open_list(run, kind)
+        counts[kind] = 0
+
+    pool    = None
+    results = list()                # (file, status code, retries) of every delete sent
+    drift   = list()                # (file, reason) of every candidate verification dropped
+    if EARLY_DELETE and DO_DELETE and not INTERACTIVE and not DELETE_ONE:
+        lprint ('Deleting files as they are decided', False)
+        pool = pool_start(lambda f: verify_delete(run, f, catalog, drift, u, p, results))
+
+    start = time.time()
+    write = 0.0                     # Seconds spent writing the lists; the rest went to classify (and the crawl, if STREAM)
+    try:
+        for (kind, file) in decisions:
+            now = time.time()
+            counts[kind] = counts[kind] + 1
+            if kind == 'skipped':
+                run['skipped'].append(file)
+                continue
+
+            outs[kind].write('%s\n' % file)
+            if pool is not None and kind == 'delete':
+                pool['work'].put(file)
+            write = write + time.time() - now
+    finally:
+        for fo in outs.values():
+            fo.close()
+    total = sum(counts.values())
+    add_phase('classify', start, total, run, secs=time.time() - start - write)
+    add_phase('write', start, total, run, secs=write)
+
+    if pool is not None:
+        pool_finish(pool)
+        add_phase('delete', start, len(results), run)
+        if VERIFY:
+            verify_report(run, counts['delete'], drift)
+        delete_report(run, results)
+
+    return counts
+
+def simulate_deletes(run, files, catalog, u, p):
+    """ DRY_RUN: check the delete candidates <files> of <run> the way a delete run would (planned, see plan_deletes,
+        and verified), and report what deleting them would free (see project_report). Nothing is deleted and no
+        artifact is downloaded; the candidates are checked with list API (metadata) requests, a folder at a time, or
+        without VERIFY with a HEAD request each. Both are sent by WORKERS threads.
+    """
+
+    start = time.time()
+    total = len(files)
+    files = plan_deletes(run, files)
+    if VERIFY:
+        files = verify_candidates(run, files, catalog)
+    else:
+        lprint ('Checking %d delete candidates with HEAD requests' % len(files), False)
+        found = set()
+        run_pool(lambda f: head_worker(f, u, p, found), files)
+        files = [f for f in files if f in found]
+    add_phase('verify', start, total, run)
+
+    project_report(run, files)
+
+def head_worker(file, u, p, found):
+    """ run_pool function for simulate_deletes: check delete candidate <file> is still in artifactory (with a HEAD
+        request, see delete_request) and add it to <found>. Returns False if it is not.
+    """
+
+    (status, retries) = delete_request(delete_uri(file), u, p)
+    if status is None or not 200 <= status <= 299:
+        lprint ('! not in artifactory (status %s): %s' % (status, file), False)
+        return False
+
+    found.add(file)
+    return True
+
+def project_report(run, files):
+    """ Log, list (by group, the biggest first) and save in run['projected'] what deleting <files> would free """
+
+    repo   = run['target']
+    groups = dict()                 # group: [candidates, bytes]
+    total  = 0
+    with RECLAIM_LOCK:
+        for f in files:
+            nbytes = RECLAIM['sizes'].get(delete_uri(f), 0)     # See plan_deletes
+            g = groups.setdefault(file_group(repo, f) or '/', [0, 0])
+            g[0] = g[0] + 1
+            g[1] = g[1] + nbytes
+            total = total + nbytes
+        RECLAIM['freed'] = RECLAIM['freed'] + total     # As if they were; a later policy plans for what is left
+
+    fo = open_list(run, 'projected')
+    fo.write('%d %d (total)\n' % (total, len(files)))
+    for (g, (count, nbytes)) in sorted(groups.items(), key=lambda x: (-x[1][1], x[0])):
+        fo.write('%d %d %s\n' % (nbytes, count, g))
+    fo.close()
+
+    lprint ('', False)
+    lprint ('Dry run: %d candidates in %d groups would free %s' % (len(files), len(groups), show_bytes(total)), False)
+    for (g, (count, nbytes)) in sorted(groups.items(), key=lambda x: (-x[1][1], x[0]))[:10]:
+        lprint ('%12s %6d  %s' % (show_bytes(nbytes), count, g), False)
+
+    run['projected'] = {'candidates': len(files), 'bytes': total,
+                        'groups': dict((g, {'candidates': c, 'bytes': b}) for (g, (c, b)) in groups.items())}
+
+def delete_files(run, lst, u, p):
+    """ Delete the files obtained from the delete list.
+        See: https://en.wikipedia.org/wiki/List_of_HTTP_status_codes   for return codes
+
+        The deletes are sent by WORKERS threads, at most DELETE_RATE a second, and a 429/5xx is retried (see
+        delete_request). INTERACTIVE and DELETE_ONE still go one file at a time.
+    """
+
+    files = list()
+    for file in lst:
+        if file.startswith('#'):    # Skip any comment in the file
+            continue
+        files.append(delete_uri(file))
+
+    lprint('%d files to delete ..' % len(files), False)
+
+    results = list()                # (file, status code, retries) of every request sent
+    if DO_DELETE and INTERACTIVE:   # Ask the user to confirm the deletion of each file
+        for file in files:
+            lprint ('%s' % file, False)
+            ans = raw_input('Ok to delete [y/n/q]: ')
+            if 'y' in ans:
+                delete_worker(file, u, p, results)
+            elif 'q' in ans:
+                break
+            else:
+                lprint ('skipping "%s"' % file, False)
+    elif DO_DELETE and DELETE_ONE:  # Delete the first file listed and return. If delete fails try the next one
+        for file in files:
+            if delete_worker(file, u, p, results):
+                break
+    else:
+        run_pool(lambda f: delete_worker(f, u, p, results), files)
+
+    delete_report(run, results)
+
+def plan_deletes(run, files):
+    """ Order the delete candidates <files> of <run> (files, or folders with a trailing '/') by DELETE_ORDER; the most
+        bytes first ('bytes'), the most bytes x days old first ('age'), or as listed ('name'). With RECLAIM_GB only
+        the ones needed to free what is still to be freed (earlier policies of the job count) are returned. The size
+        of each is kept in RECLAIM, by delete uri, to count what the deletes free (see delete_worker).
+    """
+
+    repo    = run['target']
+    catalog = run['catalogs'][repo['name']]
+    sizes   = repo['sizes']
+
+    plan = list()                   # (score, bytes, file)
+    for f in files:
+        if f.endswith('/'):         # A whole folder; it frees all of its files. Its age is that of its youngest.
+            nbytes = 0
+            days   = None
+            for k in catalog.under(f):
+                nbytes = nbytes + sizes.get(k, 0)
+                # By age, not timestamp; the offsets (so the timestamps' order) can differ
+                days = min(days, file_age(catalog[k])) if days is not None else file_age(catalog[k])
+        else:
+            nbytes = sizes.get(f, 0)
+            days   = file_age(catalog[f]) if f in catalog else None
+
+        if DELETE_ORDER == 'age':
+            score = nbytes * (days or 0)
+        else:
+            score = nbytes
+        plan.append((score, nbytes, f))
+
+    if DELETE_ORDER != 'name':
+        plan.sort(key=lambda x: -x[0])  # Stable, so equal ones stay as listed
+
+    total = sum(x[1] for x in plan)
+    lprint ('Delete plan: %d candidates, %s, by %s' % (len(plan), show_bytes(total), DELETE_ORDER), False)
+
+    with RECLAIM_LOCK:
+        for (score, nbytes, f) in plan:
+            RECLAIM['sizes'][delete_uri(f)] = nbytes
+        need = RECLAIM_GB * 1073741824 - RECLAIM['freed']
+
+    if RECLAIM_GB > 0:
+        n     = 0
+        found = 0
+        while n < len(plan) and found < need:
+            found = found + plan[n][1]
+            n = n + 1
+        if need <= 0:
+            lprint ('RECLAIM_GB (%g) already freed; all %d left for the next run' % (RECLAIM_GB, len(plan)), False)
+        else:
+            lprint ('%s still to free (RECLAIM_GB %g); %d candidates (%s) are enough, %d left for the next run' %
+                    (show_bytes(need), RECLAIM_GB, n, show_bytes(found), len(plan) - n), False)
+        plan = plan[:n]
+
+    return [x[2] for x in plan]
+
+def folder_keys(keys, folder):
+    """ Generator: yield the files of the sorted list <keys> that are in <folder> (with a trailing '/') """
+
+    n = bisect.bisect_left(keys, folder)
+    while n < len(keys) and keys[n].startswith(folder):
+        yield keys[n]
+        n = n + 1
+
+def group_keys(repo, folder):
+    """ Return the sorted files (with sizes) of the group <folder> of <repo> is in, for folder_keys. The files of each
+        group are kept as they come in (see add_size) and sorted once; EARLY_DELETE only decides a folder once all of
+        its group is in (see drain), so the group can't change after that.
+    """
+
+    group = file_group(repo, folder)
+    with RECLAIM_LOCK:
+        keys = RECLAIM['groups'].get((repo['name'], group))
+        if keys is None:
+            keys = sorted(set(repo['groups'].get(group, list())))    # A resumed crawl may list a folder again
+            RECLAIM['groups'][(repo['name'], group)] = keys
+
+    return keys
+
+def verify_candidates(run, files, catalog):
+    """ Check the delete candidates <files> against artifactory right before they are deleted; the catalog may come
+        from saved data ("-g"), a local copy or an old checkpoint. Files are fetched a folder at a time (one list API
+        request for all the candidates in it), and a folder candidate (a trailing '/') with one deep listing, by
+        WORKERS threads. What the policy decided is then checked again too (see verify_rules); a repo it checks
+        against may also come from saved data or a local copy. Returns the candidates that are still safe to delete,
+        in the order given. The others are dropped and listed in the drift list.
+    """
+
+    batches = dict()                # (folder, deep) listing: the candidates it checks
+    for f in files:
+        if f.endswith('/'):         # A whole folder; everything in it must still be old enough
+            batches[(f[:-1], True)] = [f]
+        else:
+            batches.setdefault((f[:f.rindex('/')], False), list()).append(f)
+
+    lprint ('Verifying %d delete candidates with %d listings' % (len(files), len(batches)), False)
+    safe   = list()
+    drift  = list()                 # (file or folder, reason) of each candidate dropped
+    target = run['target']
+    run_pool(lambda b: safe.extend(verify_rules(run, verify_folder(target, b[0], b[1], batches[b], catalog, drift),
+                                                drift)), sorted(batches))
+    verify_report(run, len(files), drift)
+
+    safe = set(safe)
+    return [f for f in files if f in safe]  # In the order they were planned (see plan_deletes)
+
+def verify_rules(run, files, drift):
+    """ Return the delete candidates <files> the policy of <run> still decides to delete when it asks artifactory
+        again (see the policy's recheck); the others are added to <drift>.
+    """
+
+    safe = list()
+    for file in files:
+        reason = run['policy'].recheck(run, file)
+        if reason is None:
+            safe.append(file)
+        else:
+            lprint ('! not deleting %s: %s' % (file, reason), False)
+            drift.append((file, reason))
+
+    return safe
+
+def uri_exists(uri):
+    """ Ask artifactory (with a HEAD request) if it has <uri>. Returns True or False, or None if we could not tell. """
+
+    try:
+        with request_slot():
+            resp = http_request('HEAD', uri)
+    except requests.exceptions.RequestException as e:   # Connection refused, timeout, etc.
+        lprint('! Request ERROR %s' % e, False)
+        return None
+
+    if resp.status_code == 404:
+        return False
+    if 200 <= resp.status_code <= 299:
+        return True
+    return None
+
+def verify_folder(repo, folder, deep, files, catalog, drift):
+    """ run_pool function for verify_candidates: list <folder> (all of it if <deep>) and check its delete candidates
+        <files> against what artifactory has now. Returns the candidates that are still safe to delete; the others are
+        added to <drift>.
+    """
+
+    live   = dict()                 # Timestamp of each file in the folder now
+    reason = None
+    try:
+        for f in stream_list(folder + '?list&listFolders=0&mdTimestamps=0&deep=%d' % (1 if deep else 0)):
+            live[folder + f['uri']] = f['lastModified']
+    except (ValueError, requests.exceptions.RequestException) as e:
+        reason = 'could not be checked (%s)' % e    # Never delete what we could not check
+
+    # The catalog holds the created dates (USE_CREATED_TIME), which the list API doesn't have, so the storage API is
+    # asked for each cataloged file we check; the listing still tells us which files the folder holds now
+    if reason is None and not USE_MODIFIED_TIME:
+        for file in sorted(live):
+            if file not in catalog or not (deep or file in files):
+                continue
+            data = collect_data(file)
+            if 'created' not in data:
+                reason = 'could not be checked (no created date for %s)' % file
+                break
+            live[file] = data['created']
+
+    if reason is not None:
+        for file in files:
+            lprint ('! not deleting %s: %s' % (file, reason), False)
+            drift.append((file, reason))
+        return []
+
+    safe = list()
+    for file in files:
+        if file.endswith('/'):
+            reason = folder_drift(repo, file, live, catalog)
+        else:
+            reason = file_drift(file, live.get(file), catalog)
+        if reason is None:
+            safe.append(file)
+        else:
+            lprint ('! not deleting %s: %s' % (file, reason), False)
+            drift.append((file, reason))
+
+    return safe
+
+def file_drift(file, stamp, catalog):
+    """ Return why delete candidate <file>, now last modified (created, USE_CREATED_TIME) at <stamp> (None if it is
+        gone), is no longer safe to delete, or None if it still is.
+    """
+
+    if stamp is None:
+        return 'gone'
+    if file in catalog and epoch_secs(stamp) > epoch_secs(catalog[file]):
+        return 'modified since it was cataloged (%s)' % stamp
+
+    days = file_age(stamp)
+    if days <= MAX_DAYS:
+        return 'only %d days old' % days
+
+    return None
+
+def folder_drift(repo, folder, live, catalog):
+    """ Return why folder <folder> of <repo>, now holding the files (and timestamps) in <live>, is no longer safe to
+        delete as a whole, or None if it still is. Every file in it must still be one we cataloged, unchanged.
+    """
+
+    if len(live) == 0:
+        return 'gone'
+
+    for file in sorted(live):
+        if file.split('/')[-1] in repo['folder_files']:     # Never cataloged; they go with the folder
+            continue
+        if skip_file(repo, file[file.rindex('/'):]) or skip_folder(repo, file[len(repo['path']):file.rindex('/')]):
+            return 'now holds %s (skipped)' % file
+        if file not in catalog:
+            return 'now holds %s (new)' % file
+        reason = file_drift(file, live[file], catalog)
+        if reason is not None:
+            return 'holds %s (%s)' % (file, reason)
+
+    return None
+
+def verify_report(run, total, drift):
+    """ Log how the verification of <total> delete candidates went, and list the ones dropped in the drift list """
+
+    lprint ('', False)
+    lprint ('%4d delete candidates verified' % total, False)
+    lprint ('%4d dropped (changed in artifactory since they were cataloged, or no longer deleted by the policy)' % len(drift), False)
+    if len(drift) > 0:
+        write_list(run, 'drift', ['%s (%s)' % d for d in drift])
+
+def verify_delete(run, file, catalog, drift, u, p, results):
+    """ pool_start function for emit (EARLY_DELETE): verify one delete candidate <file> (or folder) of the repo <run>
+        cleans, and delete it if it is still safe to. Returns False if the delete failed.
+    """
+
+    repo = run['target']
+    if VERIFY:
+        if file.endswith('/'):
+            safe = verify_folder(repo, file[:-1], True, [file], catalog, drift)
+        else:
+            safe = verify_folder(repo, file[:file.rindex('/')], False, [file], catalog, drift)
+        if len(safe) > 0:
+            safe = verify_rules(run, safe, drift)
+        if len(safe) == 0:
+            return True             # Dropped; see verify_report
+
+    # What it frees (see delete_report); plan_deletes is not run, so a folder is sized here the same way
+    sizes = repo['sizes']
+    if file.endswith('/'):
+        nbytes = sum(sizes[k] for k in folder_keys(group_keys(repo, file), file))
+    else:
+        nbytes = sizes.get(file, 0)
+    with RECLAIM_LOCK:
+        RECLAIM['sizes'][delete_uri(file)] = nbytes
+    return delete_worker(delete_uri(file), u, p, results)
+
+def delete_uri(file):
+    """ Return the URI a delete request for <file> (a storage API URI) is sent to """
+
+    # To delete the file we must reformat the path aquired and remove the string '/api/storage'
+    # from the path. If we do not do this calls to delete will return "400" (bad request).
+    if DO_DELETE:
+        return file.replace('/api/storage', '')
+    return file
+
+def delete_worker(file, u, p, results):
+    """ Delete (or "head") one file and log the result. Returns False if it failed. Once RECLAIM_GB is freed the rest
+        are left for the next run.
+    """
+
+    with RECLAIM_LOCK:
+        if RECLAIM_GB > 0 and RECLAIM['freed'] >= RECLAIM_GB * 1073741824:
+            RECLAIM['left'] = RECLAIM['left'] + 1
+            return True
+
+    if DO_DELETE:
+        lprint ('deleteing "%s"' % file, False)
+    else:
+        lprint ('"head" "%s"' % file, False)
+
+    (status, retries) = delete_request(file, u, p)
+    results.append((file, status, retries))
+    if status is None or not 200 <= status <= 299:  # Success values (200-299)
+        lprint ('* Fail: status code: %s (%s)' % (status, file), False)
+        return False
+
+    lprint ('request status returned: %d' % status, False, DEBUG)
+    with RECLAIM_LOCK:
+        RECLAIM['freed'] = RECLAIM['freed'] + RECLAIM['sizes'].get(file, 0)
+    return True
+
+def delete_request(file, u, p):
+    """ Send one delete request (a HEAD when DO_DELETE is not set). A 429 (too many requests), 5xx or failed
+        connection is retried up to DELETE_RETRIES times, waiting RETRY_BACKOFF seconds and doubling that each time
+        (unless artifactory says how long in a Retry-After header). Returns (status code or None, retries).
+    """
+
+    status = None
+    for n in range(DELETE_RETRIES + 1):
+        rate_limit()
+        wait = None
+        try:
+            with request_slot():
+                if DO_DELETE:
+                    resp = http_request('DELETE', file, auth=(u, p))
+                else:               # Only the status; never the file itself
+                    resp = http_request('HEAD', file, auth=(u, p))
+        except requests.exceptions.RequestException as e:   # Connection refused, timeout, etc.
+            lprint('! Request ERROR %s' % e, False)
+            status = None
+        else:
+            status = resp.status_code
+            if status != 429 and status < 500:  # Any other answer won't change by asking again
+                return (status, n)
+            wait = resp.headers.get('Retry-After')
+
+        if n == DELETE_RETRIES:
+            break
+
+        if wait is None or not wait.isdigit():
+            # Spread the retries out a bit (jitter) so the workers don't all come back at the same time
+            wait = RETRY_BACKOFF * (2 ** n) * random.uniform(0.5, 1.5)
+        wait = min(float(wait), MAX_BACKOFF)
+        lprint ('  status %s .. retrying "%s" in %.1f seconds' % (status, file, wait), False)
+        record('retries', 1)
+        time.sleep(wait)
+
+    return (status, DELETE_RETRIES)
+
+def rate_limit():
+    """ Token bucket: wait until we're allowed to send the next delete request. The bucket fills at DELETE_RATE
+        tokens a second (holding at most DELETE_RATE) and each request takes one.
+    """
+
+    if DELETE_RATE <= 0:            # No limit
+        return
+
+    while True:
+        with BUCKET_LOCK:
+            now = time.time()
+            BUCKET['tokens'] = min(DELETE_RATE, BUCKET['tokens'] + (now - BUCKET['time']) * DELETE_RATE)
+            BUCKET['time']   = now
+            if BUCKET['tokens'] >= 1:
+                BUCKET['tokens'] -= 1
+                return
+            wait = (1 - BUCKET['tokens']) / DELETE_RATE
+
+        time.sleep(wait)
+
+def delete_report(run, results):
+    """ Log how the delete requests went. Files that could not be deleted are also saved to the failed list. """
+
+    failed  = [r[0] for r in results if r[1] is None or not 200 <= r[1] <= 299]
+    retries = sum(r[2] for r in results)
+    failset = set(failed)
+    with RECLAIM_LOCK:
+        freed = sum(RECLAIM['sizes'].get(r[0], 0) for r in results if r[0] not in failset)
+        left  = RECLAIM['left']
+
+    lprint ('', False)
+    lprint ('%4d requests sent' % len(results), False)
+    lprint ('%4d succeeded' % (len(results) - len(failed)), False)
+    lprint ('%4d failed' % len(failed), False)
+    lprint ('%4d retries' % retries, False)
+    lprint ('%s freed' % show_bytes(freed), False)
+    if left > 0:
+        lprint ('%4d left for the next run (RECLAIM_GB %g was freed)' % (left, RECLAIM_GB), False)
+    if len(failed) > 0:
+        write_list(run, 'failed', failed)
+    if DO_DELETE:       # Still in the saved catalog; the next incremental run leaves them out (see delta_apply)
+        run['deleted'].extend(r[0] for r in results if r[0] not in failset)
+
+    run['deletes'] = {'sent': len(results), 'succeeded': len(results) - len(failed), 'failed': len(failed),
+                      'retries': retries, 'bytes_freed': freed}
+
+def show_bytes(n):
+    """ Return <n> bytes as KB, MB or GB, for the log """
+
+    for (unit, size) in [('GB', 1073741824.0), ('MB', 1048576.0), ('KB', 1024.0)]:
+        if n >= size:
+            return '%.2f %s' % (n / size, unit)
+    return '%d bytes' % n
+
+def file_age(stamp):
+    """ Return the age, in days, of an artifactory (or, FROM_OS, an OS) timestamp """
+
+    if FROM_OS:   # Date is formatted differently (and has no offset)
+        file_dt = datetime.datetime.strptime(stamp, '%a %b %d %H:%M:%S %Y')
+        return TODAY - (file_dt.toordinal() - EPOCH_ORDINAL)
+
+    return TODAY - epoch_day(stamp)
+
+def epoch_day(stamp):
+    """ Return the UTC day number (days since 1970-01-01) of an artifactory ISO 8601 timestamp, honouring its offset
+        ("2020-05-11T13:20:55.123-04:00" is day 18393, "2020-05-11T23:20:55.123-04:00" is day 18394).
+    """
+
+    return epoch_secs(stamp) // 86400
+
+def epoch_secs(stamp):
+    """ Return an artifactory ISO 8601 timestamp as seconds since the epoch (to the minute), honouring its offset.
+
+        Most files share a handful of dates, so the UTC second a date (with its offset) starts at is kept in
+        DAY_CACHE and the time of day is looked up in MINUTES; all that is left is integer math. Offsets are in whole
+        minutes, so the seconds can never move the time into another day. The offset may be "Z", "+HH:MM" or "+HHMM"
+        (or "-").
+    """
+
+    # The offset follows the time ("-04:00", "+0530"); a "Z" (or no offset) is UTC. Seconds and fractions in
+    # between are left out of the key, so there is one entry per date and offset.
+    n = max(stamp.rfind('+'), stamp.rfind('-'))
+    if n > 10:
+        offset = stamp[n:]
+    else:
+        offset = ''
+
+    key   = stamp[:10] + offset                     # "2020-05-11" + "-04:00"
+    start = DAY_CACHE.get(key)
+    if start is None:
+        start = (datetime.date(int(stamp[0:4]), int(stamp[5:7]), int(stamp[8:10])).toordinal() - EPOCH_ORDINAL) * 86400
+        if offset:
+            digits = offset[1:].replace(':', '')    # "0400"
+            secs   = int(digits[:2]) * 3600 + int(digits[2:4] or 0) * 60
+            if offset[0] == '-':
+                start = start + secs
+            else:
+                start = start - secs
+        DAY_CACHE[key] = start
+
+    return start + MINUTES[stamp[11:16]]
+
+def parse_options():
+    """ Parse options that are set in the environment (from Jenkins). Each policy parses its own (see cli.main). """
+
+    global VERBOSE, MAX_DAYS, CLEAN, DO_DELETE, DRY_RUN, DELETE_ONE, WORKERS, MAX_CONNECTIONS, READ_TIMEOUT
+    global USE_LIST_API, RESUME, INCREMENTAL, INCREMENTAL_DAYS, CATALOG_FORMAT, USE_CREATED_TIME, USE_MODIFIED_TIME
+    global DELETE_RATE, DELETE_RETRIES, STREAM, EARLY_DELETE, LOCAL_REPOS, LOG_LEVEL, LOG_MAX_MB, VERIFY
+    global PROGRESS_SECS, BASE_PATH, HTTP_CACHE, CACHE_MAX_MB, CACHE_TTL_HOURS, ADAPTIVE, DELETE_ORDER, RECLAIM_GB
+
+    tmp = os.getenv("VERBOSE")
+    if tmp and tmp.lower() in ['true', '1']:
+        VERBOSE = True
+
+    tmp = os.getenv("DELETE_ONE")               # Used as a test. Run scans but exit after deleting one file
+    if tmp and tmp.lower() in ['true', '1']:
+        DELETE_ONE = True
+
+    tmp = os.getenv("DO_DELETE")                # Process the files marked for deletion
+    if tmp and tmp.lower() in ['true', '1']:
+        DO_DELETE = True
+
+    tmp = os.getenv("DRY_RUN")                  # Only report what deleting the candidates would free
+    if tmp and tmp.lower() in ['true', '1']:
+        DRY_RUN = True
+        if DO_DELETE:
+            lprint ('DRY_RUN is set .. nothing will be deleted', False)
+            DO_DELETE = False
+
+    tmp = os.getenv("KEEP_FILES")               # Don't remove the files generated
+    if tmp and tmp.lower() in ['true', '1']:
+        CLEAN = False
+
+    tmp = os.getenv("USE_CREATED_TIME")         # Compare 'created' time stamp instead of 'lastModified'
+    if tmp and tmp.lower() in ['true', '1']:
+        USE_CREATED_TIME = True
+        USE_MODIFIED_TIME = False
+
+    tmp = os.getenv("MAX_DAYS")
+    if tmp:
+        MAX_DAYS = int(tmp)
+
+    tmp = os.getenv("WORKERS")                  # Number of concurrent crawl workers
+    if tmp:
+        WORKERS = int(tmp)
+
+    tmp = os.getenv("ADAPTIVE")                 # Adjust the requests in flight to how artifactory is coping
+    if tmp and tmp.lower() in ['true', '1']:
+        ADAPTIVE = True
+    throttle_reset()                            # However many repos are being crawled at the same time
+
+    tmp = os.getenv("MAX_CONNECTIONS")          # Max keep-alive connections to artifactory
+    if tmp:
+        MAX_CONNECTIONS = int(tmp)
+
+    tmp = os.getenv("HTTP_TIMEOUT")             # Seconds to wait for artifactory to answer
+    if tmp:
+        READ_TIMEOUT = int(tmp)
+
+    tmp = os.getenv("LOG_LEVEL")                # Only log messages of this level and up (debug, info or warning)
+    if tmp and tmp.upper() in ['DEBUG', 'INFO', 'WARNING']:
+        LOG_LEVEL = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING}[tmp.upper()]
+
+    tmp = os.getenv("LOG_MAX_MB")               # Rotate the log once it is this big
+    if tmp:
+        LOG_MAX_MB = int(tmp)
+
+    tmp = os.getenv("PROGRESS_SECS")            # Log a progress line this often
+    if tmp:
+        PROGRESS_SECS = int(tmp)
+
+    tmp = os.getenv("HTTP_CACHE")               # Keep folder/file info between runs (see collect_data)
+    if tmp and tmp.lower() in ['true', '1']:
+        HTTP_CACHE = True
+
+    tmp = os.getenv("CACHE_MAX_MB")             # Size the HTTP cache is kept under
+    if tmp:
+        CACHE_MAX_MB = int(tmp)
+
+    tmp = os.getenv("CACHE_TTL_HOURS")          # How long a cached file of an immutable repo is trusted
+    if tmp:
+        CACHE_TTL_HOURS = float(tmp)
+
+    tmp = os.getenv("DELETE_RATE")              # Max delete requests a second
+    if tmp:
+        DELETE_RATE = float(tmp)
+
+    tmp = os.getenv("DELETE_RETRIES")           # Times a failed (429/5xx) delete is retried
+    if tmp:
+        DELETE_RETRIES = int(tmp)
+
+    tmp = os.getenv("USE_TRAVERSE")             # Crawl every folder/file instead of using the list API
+    if tmp and tmp.lower() in ['true', '1']:
+        USE_LIST_API = False
+
+    tmp = os.getenv("RESUME")                   # Pick up an interrupted crawl from its checkpoint
+    if tmp and tmp.lower() in ['true', '1']:
+        RESUME = True
+
+    tmp = os.getenv("INCREMENTAL")              # Only catalog the files that changed since the last run
+    if tmp and tmp.lower() in ['true', '1']:
+        INCREMENTAL = True
+
+    tmp = os.getenv("INCREMENTAL_DAYS")         # Crawl everything again once the last full crawl is this old
+    if tmp:
+        INCREMENTAL_DAYS = int(tmp)
+
+    tmp = os.getenv("NO_VERIFY")                # Don't check the files against artifactory again before deleting
+    if tmp and tmp.lower() in ['true', '1']:
+        VERIFY = False
+
+    tmp = os.getenv("ARTIFACTORY_URL")          # Another artifactory (or a stand-in, see benchmarks/)
+    if tmp:
+        BASE_PATH = tmp.rstrip('/')
+
+    tmp = os.getenv("LOCAL_REPOS")              # Scan the local copies of the repos in this folder
+    if tmp:
+        LOCAL_REPOS = tmp
+
+    tmp = os.getenv("STREAM")                   # Decide each file as the crawl finds it
+    if tmp and tmp.lower() in ['true', '1']:
+        STREAM = True
+
+    tmp = os.getenv("EARLY_DELETE")             # Delete files as they are decided (so we must stream)
+    if tmp and tmp.lower() in ['true', '1']:
+        EARLY_DELETE = True
+        STREAM = True
+
+    tmp = os.getenv("CATALOG_FORMAT")           # How catalogs are saved (txt or sqlite); see STORES
+    if tmp and tmp.lower() in STORES:
+        CATALOG_FORMAT = tmp.lower()
+
+    tmp = os.getenv("DELETE_ORDER")             # Which candidates are deleted first (see plan_deletes)
+    if tmp and tmp.lower() in ['bytes', 'age', 'name']:
+        DELETE_ORDER = tmp.lower()
+
+    tmp = os.getenv("RECLAIM_GB")               # Stop deleting once this much is freed
+    if tmp:
+        RECLAIM_GB = float(tmp)
+
+    # The candidates can only be planned once they are all known, so they are deleted once the crawl is done
+    if RECLAIM_GB > 0 and EARLY_DELETE:
+        lprint ('RECLAIM_GB is set .. deleting once the crawl is done (not EARLY_DELETE)', False)
+        EARLY_DELETE = False
+
+    # Artifactory only tells an incremental run what was added or changed, so a file it takes from the last run may
+    # be gone by now. Only the verification (see verify_candidates) makes that safe.
+    if INCREMENTAL and not VERIFY:
+        lprint ('NO_VERIFY is set .. crawling everything (not INCREMENTAL)', False)
+        INCREMENTAL = False
+
+def log_options():
+    """ Log, and maybe show, which options were called """
+
+    lprint ('\nScript called with these options..', False)
+    lprint ('ARTIFACTORY: %s' % BASE_PATH, False)
+    lprint ('WAIT: %s' % WAIT, False)
+    lprint ('VERBOSE: %s' % VERBOSE, False)
+    lprint ('MAX_DAYS: %d' % MAX_DAYS, False)
+    lprint ('WORKERS: %d' % WORKERS, False)
+    lprint ('ADAPTIVE: %s' % ADAPTIVE, False)
+    lprint ('USE LIST API: %s' % USE_LIST_API, False)
+    lprint ('RESUME: %s' % RESUME, False)
+    lprint ('INCREMENTAL: %s' % INCREMENTAL, False)
+    lprint ('INCREMENTAL_DAYS: %d' % INCREMENTAL_DAYS, False)
+    lprint ('CATALOG FORMAT: %s' % CATALOG_FORMAT, False)
+    lprint ('LOCAL_REPOS: %s' % LOCAL_REPOS, False)
+    lprint ('VERIFY: %s' % VERIFY, False)
+    lprint ('STREAM: %s' % STREAM, False)
+    lprint ('EARLY_DELETE: %s' % EARLY_DELETE, False)
+    lprint ('MAX_CONNECTIONS: %d' % MAX_CONNECTIONS, False)
+    lprint ('HTTP_TIMEOUT: %d' % READ_TIMEOUT, False)
+    lprint ('LOG_LEVEL: %d' % LOG_LEVEL, False)
+    lprint ('LOG_MAX_MB: %d' % LOG_MAX_MB, False)
+    lprint ('PROGRESS_SECS: %d' % PROGRESS_SECS, False)
+    lprint ('HTTP_CACHE: %s' % HTTP_CACHE, False)
+    lprint ('CACHE_MAX_MB: %d' % CACHE_MAX_MB, False)
+    lprint ('CACHE_TTL_HOURS: %g' % CACHE_TTL_HOURS, False)
+    lprint ('DELETE_ORDER: %s' % DELETE_ORDER, False)
+    lprint ('RECLAIM_GB: %g' % RECLAIM_GB, False)
+    lprint ('DELETE_RATE: %g' % DELETE_RATE, False)
+    lprint ('DELETE_RETRIES: %d' % DELETE_RETRIES, False)
+    lprint ('DO_DELETE: %s' % DO_DELETE, False)
+    lprint ('DRY_RUN: %s' % DRY_RUN, False)
+    lprint ('DELETE_ONE: %s' % DELETE_ONE, False)
+    lprint ('INTERACTIVE: %s' % INTERACTIVE, False)
+    lprint ('CLEAN UP FILES: %s' % CLEAN, False)
+    lprint ('USE CREATED TIME: %s' % USE_CREATED_TIME, False)
+    lprint ('USE MODIFIED TIME: %s' % USE_MODIFIED_TIME, False)
+
+def add_phase(name, start, items, run=None, repo=None, secs=None):
+    """ Add the time since <start> (or <secs>) and the <items> handled to phase <name> of the run's summary. The
+        phase is kept per policy (<run>) and/or repo, so a phase done more than once (say, writing the lists) adds up.
+    """
+
+    if secs is None:
+        secs = time.time() - start
+    policy = run['policy'].NAME if run is not None else None
+
+    with METRICS_LOCK:
+        for ph in METRICS['phases']:
+            if (ph['phase'], ph['policy'], ph['repo']) == (name, policy, repo):
+                ph['secs']  = ph['secs'] + secs
+                ph['items'] = ph['items'] + items
+                return
+        METRICS['phases'].append({'phase': name, 'policy': policy, 'repo': repo, 'secs': secs, 'items': items})
+
+def percentile(values, pct):
+    """ Return the <pct> percentile of the sorted list <values> (0 if it is empty) """
+
+    if len(values) == 0:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+def http_stats():
+    """ Return the run's HTTP numbers so far; requests (by method), bytes, errors, retries, latency and rates """
+
+    with METRICS_LOCK:
+        latency = sorted(METRICS['latency'])
+        stats   = {'requests': sum(METRICS['requests'].values()), 'by_method': dict(METRICS['requests']),
+                   'bytes': METRICS['bytes'], 'errors': METRICS['errors'], 'retries': METRICS['retries'],
+                   'parse_secs': round(METRICS['parse_secs'], 3), 'entries': METRICS['entries'],
+                   'cache': {'hits': METRICS['cache_hits'], 'not_modified': METRICS['cache_304s'],
+                             'misses': METRICS['cache_misses']}}
+    with THROTTLE_COND:
+        stats['throttle'] = {'limit': int(THROTTLE['limit']), 'lowest': THROTTLE['lowest'], 'cuts': THROTTLE['cuts'],
+                             'trips': THROTTLE['trips'], 'paused_secs': THROTTLE['paused_secs']}
+
+    elapsed = max(time.time() - METRICS['started'], 0.001)
+    stats['latency_ms'] = {'p50': round(percentile(latency, 50) * 1000, 1), 'p95': round(percentile(latency, 95) * 1000, 1),
+                           'p99': round(percentile(latency, 99) * 1000, 1), 'max': round(latency[-1] * 1000, 1) if latency else 0.0}
+    stats['requests_per_sec'] = round(stats['requests'] / elapsed, 1)
+    stats['bytes_per_sec']    = round(stats['bytes'] / elapsed, 1)
+    stats['entries_per_sec']  = round(stats['entries'] / elapsed, 1)
+
+    return stats
+
+def write_stats(runs):
+    """ Write the run's summary (per phase wall time and items a second, the HTTP numbers and each policy's counts)
+        to STATS_FILE as JSON, and log the phases. Phases that overlap (crawls running at the same time, or classify
+        and the crawl with STREAM) each count their own wall time.
+    """
+
+    phases = list()
+    for ph in METRICS['phases']:
+        ph = dict(ph)
+        ph['items_per_sec'] = round(ph['items'] / ph['secs'], 1) if ph['secs'] > 0 else 0.0
+        ph['secs'] = round(ph['secs'], 3)
+        phases.append(ph)
+
+    stats = {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(METRICS['started'])),
+             'elapsed_secs': round(time.time() - METRICS['started'], 3), 'phases': phases, 'http': http_stats(),
+             'policies': dict()}
+    for run in runs:
+        stats['policies'][run['policy'].NAME] = {'counts': run['counts'], 'deletes': run['deletes'],
+                                                 'projected': run['projected'],
+                                                 'catalogs': dict((k, len(v)) for (k, v) in run['catalogs'].items())}
+
+    lprint ('\nPhase timing', False)
+    for ph in phases:
+        lprint ('%9.2fs %-9s %-12s %-14s %d items (%.1f/s)' % (ph['secs'], ph['phase'], ph['policy'] or '',
+                ph['repo'] or '', ph['items'], ph['items_per_sec']), False)
+    http = stats['http']
+    lprint ('%d requests, %d bytes, %d errors, %d retries; latency p50 %.1f p95 %.1f p99 %.1f ms' %
+            (http['requests'], http['bytes'], http['errors'], http['retries'], http['latency_ms']['p50'],
+             http['latency_ms']['p95'], http['latency_ms']['p99']), False)
+    if ADAPTIVE:
+        lprint ('Requests in flight: %d at the end, %d at the lowest; %d cuts, breaker tripped %d times (%d seconds)' %
+                (http['throttle']['limit'], http['throttle']['lowest'], http['throttle']['cuts'],
+                 http['throttle']['trips'], http['throttle']['paused_secs']), False)
+    if HTTP_CACHE:
+        lprint ('HTTP cache: %d hits, %d not modified (304), %d misses' % (http['cache']['hits'],
+                http['cache']['not_modified'], http['cache']['misses']), False)
+
+    lprint ('Writing run stats to %s' % STATS_FILE, False)
+    with open(STATS_FILE, 'w') as fo:
+        json.dump(stats, fo, indent=2, sort_keys=True)
+        fo.write('\n')
+
+def progress_start():
+    """ Start a thread logging a progress line every PROGRESS_SECS (for long crawls), until progress_stop() """
+
+    if PROGRESS_SECS <= 0:
+        return
+
+    t = threading.Thread(target=progress_worker)
+    t.daemon = True                 # Never let it keep the script alive
+    t.start()
+
+def progress_stop():
+    """ Stop the progress thread (if it is running) """
+
+    PROGRESS_STOP.set()
+
+def progress_worker():
+    """ Progress thread: log the HTTP numbers so far (shown even when not VERBOSE) every PROGRESS_SECS """
+
+    while not PROGRESS_STOP.wait(PROGRESS_SECS):
+        http = http_stats()
+        lprint ('Progress: %d requests (%.1f/s), %d files cataloged (%.1f/s), %.1f MB, %d errors, %d retries, p95 %.1f ms, %d in flight' %
+                (http['requests'], http['requests_per_sec'], http['entries'], http['entries_per_sec'],
+                 http['bytes'] / 1048576.0, http['errors'], http['retries'], http['latency_ms']['p95'],
+                 http['throttle']['limit']), False, WARNING)
+
+def cleanup_temp_files(runs):
+    """ Clean up temp files """
+
+    files = list()
+    for run in runs:
+        files.extend(run['lists'].values())
+        if not INCREMENTAL:     # The next incremental run needs the catalogs and delta files
+            for repo in run['repos']:
+                files.extend([repo['catalog'], repo['delta_file']])
+
+    for f in sorted(set(files)):
+        if os.path.exists(f):
+            lprint ('rm ' + f, False)
+            try:
+                os.remove(f)
+            except OSError:
+                lprint ('  could not remove %s' % f, False)
+
+def lprint(msg, wait, level=INFO):
+    """ Log and print a message. The log file is written by a background thread (see log_writer), so a crawl worker
+        never waits on the disk. Messages below LOG_LEVEL are not logged; WARNING messages are shown even if not VERBOSE.
+    """
+
+    if LOG_DATA and level >= LOG_LEVEL: # If set keep a recoed of what we did (even if NOT in verbose mode)
+        if LOG_THREAD is None:
+            log_open()
+        LOG_QUEUE.put(msg)
+
+    if VERBOSE:                         # Verbose is set
+        with LOG_LOCK:                  # Crawl workers log at the same time, so only one message at a time
+            if wait:                    # And requested user intervention
+                if WAIT:                # And the WAIT option was issued
+                    raw_input(msg)      # Display message and wait for user
+                else:                   # WAIT option not issued; so display the message and wait a few seconds
+                    print msg           # Show message
+                    sys.stdout.flush()  # Make sure we flush the msg before sleeping
+                    time.sleep(2)       # And delay (instead of wait)
+            else:
+                print msg               # print did not request user input (to wait) so just print message
+                sys.stdout.flush()
+    elif level >= WARNING:              # If we have a warning to show, do it even if verbose not set
+        with LOG_LOCK:
+            print msg
+            sys.stdout.flush()
+
+def log_open():
+    """ Start the log writer thread (on the first message logged) """
+
+    global LOG_THREAD
+
+    with LOG_LOCK:
+        if LOG_THREAD is None:
+            LOG_THREAD = threading.Thread(target=log_writer)
+            LOG_THREAD.daemon = True    # log_close (at exit) drains the queue before the script goes away
+            LOG_THREAD.start()
+            atexit.register(log_close)
+
+def log_close():
+    """ Write whatever is still queued and stop the log writer """
+
+    global LOG_THREAD
+
+    if LOG_THREAD is not None:
+        LOG_QUEUE.put(None)
+        LOG_THREAD.join()
+        LOG_THREAD = None
+
+def log_writer():
+    """ Log writer thread: write the queued messages through one open (buffered) file, flushing it whenever the queue
+        runs dry, until told to stop (a None message). The log is rotated once it grows past LOG_MAX_MB.
+    """
+
+    lf   = open(LOG_FILE, 'a')
+    size = os.path.getsize(LOG_FILE)
+    while True:
+        msg = LOG_QUEUE.get()
+        if msg is None:
+            break
+
+        lf.write(msg + '\n')
+        size = size + len(msg) + 1
+        if LOG_MAX_MB > 0 and size > LOG_MAX_MB * 1024 * 1024:
+            lf.close()
+            log_rotate()
+            lf   = open(LOG_FILE, 'a')
+            size = 0
+        elif LOG_QUEUE.empty():         # Caught up, so let anyone watching the log see it
+            lf.flush()
+
+    lf.close()
+
+def log_rotate():
+    """ Move log.txt to log.1.txt (log.1.txt to log.2.txt, etc), keeping LOG_BACKUPS old logs """
+
+    (base, ext) = os.path.splitext(LOG_FILE)
+    for n in range(LOG_BACKUPS, 0, -1):
+        old = LOG_FILE if n == 1 else '%s.%d%s' % (base, n - 1, ext)
+        if os.path.exists(old):
+            os.rename(old, '%s.%d%s' % (base, n, ext))  # Replaces the oldest one
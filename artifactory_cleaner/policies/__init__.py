@@ -0,0 +1,29 @@
+# This package MUST be used with python 2.x
+#
+# The cleaning policies; one module per kind of repo. The engine does the crawling, the list files and the deleting,
+# a policy only says which repos it needs and what to do with each file of the one it cleans. A policy module has;
+#
+#   NAME            what it is called on the command line ("-a npm,snapshots")
+#   GROUPS          True to get the files a group (top level folder) at a time when streaming (see engine.drain)
+#   LISTS           the list kinds classify() decides files into ('keep', 'delete', 'skipped', and its own)
+#   LIST_FILES      the files its own list kinds are written to (added to engine.LIST_FILES)
+#   COUNTS          (list kind, text) of each count logged in the summary ("%4d entries <text>")
+#   SKIP_FOLDERS    folder skip list of the repo it cleans ("-S" adds to it)
+#   SKIP_FILES      file skip list of the repo it cleans
+#
+#   parse_options() parse its own options from the environment (set by Jenkins, or cli.main from its flags)
+#   log_options()   log them
+#   repos()         the repos it needs (see engine.new_repo), the one it cleans last
+#   list_header(kind)   the header lines of a list file, or None for the engine's (see engine.list_header)
+#   classify(batches, run)  pipeline stage; yield a (list kind, file or folder) for every file in the batches of
+#                   (file, timestamp) pairs. The catalogs of the other repos are in run['catalogs'] (read like
+#                   dicts, plus under(prefix) and older(days); see engine.Catalog and engine.DbCatalog).
+#   recheck(run, file)  why a delete candidate is no longer one, asking artifactory again rather than the catalogs
+#                   (which may be old), or None; called for each candidate right before it is deleted (see
+#                   engine.verify_rules)
+#
+# To add a policy, write its module and add it to POLICIES below. See README.md
+
+from artifactory_cleaner.policies import npm, snapshots
+
+POLICIES = {npm.NAME: npm, snapshots.NAME: snapshots}
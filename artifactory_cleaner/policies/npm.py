@@ -0,0 +1,184 @@
+# This module MUST be used with python 2.x
+#
+# npm-dev policy (REL-11257); a file in the npm-dev repo is deleted once it is older than MAX_DAYS and has not made it
+# to the npm-release repo.
+
+import os
+import re
+from artifactory_cleaner import engine
+from artifactory_cleaner.engine import lprint, DEBUG
+
+NAME   = 'npm'
+GROUPS = False      # Every dev file is decided on its own, so there is no need to wait for its group
+LISTS  = ['keep', 'delete', 'in_release', 'skipped']
+LIST_FILES = {'in_release': 'in_release_repo.txt'}      # Files found in release repo (to keep)
+COUNTS = [('in_release', 'skipped (Found in release repo)'), ('keep', 'kept (Too young)'), ('delete', 'to delete')]
+
+DEV_REPO = 'npm-dev'        # Maybe future versions will have these be a param from Jenkins
+REL_REPO = 'npm-release'
+
+MATCH_VERSIONS = False  # Also keep dev files whose package/version is anywhere in the release repo : CLI and Jenkins
+
+# Skip the following FOLDERS in the npm-dev repo
+# This list can be appended to via the "-S <list,of,folders>" option (comma seperated) or, from Jenkins,
+# by adding folders in the "SKIP_LIST" parameter.
+SKIP_FOLDERS = ['.npm/@bullhorn-internal', '.npm/@bullhorn',     '.npm/bh-elements',
+                '.npm/symphony-staffing',  '.npm/chomsky',       '.npm/galaxy-parser',
+                '.npm-generator-novo',     '@bullhorn-internal', '@bullhorn',
+                'bh-elements',             'symphony-staffing',  'chomsky',
+                'galaxy-parser',           'generator-novo'
+               ]
+
+# Skip FILES in this list. For now I skip variants of "DO_NOT_DELETE" in the file name, and files names "package.json"
+# This list can only be modified here (for now).
+SKIP_FILES = ['DONOTDELETE',   'DO_NOT_DELETE',   'DONTDELETE',
+              'DONT_DELETE',   'package.json'
+             ]
+
+# npm tarballs are stored as "<package>/-/<package>-<version>.tgz" (scoped ones as "@scope/<package>/-/<package>-...")
+NPM_TARBALL = re.compile(r'/((?:@[^/]+/)?([^/]+))/-/\2-(\d+\.\d+\.\d+[^/]*)\.tgz$', re.IGNORECASE)
+
+def parse_options():
+    """ Parse the npm options that are set in the environment (from Jenkins) """
+
+    global MATCH_VERSIONS
+
+    tmp = os.getenv("SKIP_LIST")                # Append new folders to skip to the default list
+    if tmp:
+        SKIP_FOLDERS.extend(tmp.split(','))
+
+    tmp = os.getenv("MATCH_VERSIONS")           # Keep dev files whose package/version is in the release repo
+    if tmp and tmp.lower() in ['true', '1']:
+        MATCH_VERSIONS = True
+
+def log_options():
+    """ Log which npm options were called """
+
+    lprint ('MATCH_VERSIONS: %s' % MATCH_VERSIONS, False)
+    lprint ('SKIP FILES: %s' % ', '.join(SKIP_FILES), False)
+    lprint ('SKIP FOLDERS: %s' % ', '.join(SKIP_FOLDERS), False)
+
+def repos():
+    """ The release repo (only cataloged, to check against) and the dev repo we clean """
+
+    return [engine.new_repo(REL_REPO, 'release', clean=False, immutable=True),   # Published versions never change
+            engine.new_repo(DEV_REPO, 'dev', skip_folders=SKIP_FOLDERS, skip_files=SKIP_FILES)]
+
+def list_header(kind):
+    """ The header lines of the npm list files """
+
+    if kind == 'keep':
+        return ["These files were not found in the release repo but are < %d days old (will be kept)" % engine.MAX_DAYS]
+    elif kind == 'in_release':
+        return ["These files are found in both the dev repo and release repo and will not be removed"]
+    elif kind == 'delete':
+        return ["These files are marked for deletion because they are not in the release repo, are not in one of the skip lists",
+                "and their lastModified date is > %d days" % engine.MAX_DAYS]
+
+    return None
+
+def release_index(rel_catalog):
+    """ Index the release catalog for release_match(). The catalog itself answers for exact paths and prefixes (a saved
+        SQLite one with queries, see engine.DbCatalog); with MATCH_VERSIONS we add the set of (package, version) pairs
+        in the release repo.
+    """
+
+    index = {'catalog': rel_catalog, 'packages': set()}
+    if MATCH_VERSIONS:
+        index['packages'] = set(npm_package(k) for k in rel_catalog)
+        index['packages'].discard(None)
+
+    return index
+
+def release_match(index, rel_to_chk, dev_file):
+    """ See if the dev file (as release key <rel_to_chk>) is in the release repo. Returns;
+          'path'     the same path is in the release catalog
+          'prefix'   a release path starts with our key, but isn't it (we can't tell, so the file must be kept)
+          'package'  the same package/version is in the release repo under another path (MATCH_VERSIONS only)
+          None       not in the release repo
+    """
+
+    if rel_to_chk in index['catalog']:
+        return 'path'
+
+    # Every key starts with the repo's url, so the only way our key can be part of a release key is at its start
+    if len(index['catalog'].under(rel_to_chk)) > 0:
+        return 'prefix'
+
+    if MATCH_VERSIONS and npm_package(dev_file) in index['packages']:
+        return 'package'
+
+    return None
+
+def npm_package(path):
+    """ Return the (package, version) of an npm tarball path ("<package>/-/<package>-<version>.tgz"), or None """
+
+    m = NPM_TARBALL.search(path)
+    if m is None:
+        return None
+
+    return (m.group(1).lower(), m.group(3))     # Scoped packages keep their scope ("@scope/name")
+
+def recheck(run, dev_file):
+    """ Return why delete candidate <dev_file> is no longer one, or None if it still is. The release catalog may be
+        older than the dev file's verification (saved data, a local copy), so the release repo is asked (with a HEAD
+        request) if the file has made it there since. A MATCH_VERSIONS match under another path can't be asked for
+        that way; the release catalog has to do for that.
+    """
+
+    (rel, dev) = run['repos']
+    found = engine.uri_exists(rel['path'] + dev_file[len(dev['path']):])
+    if found:
+        return 'now in the release repo'
+    if found is None:
+        return 'could not check the release repo'      # Never delete what we could not check
+
+    return None
+
+def classify(batches, run):
+    """ Pipeline stage: decide what to do with each (dev file, timestamp) of <batches>, yielding (list kind, dev file)
+        as soon as it is decided. The list kind is 'in_release', 'skipped', 'keep' or 'delete'.
+    """
+
+    (rel, dev) = run['repos']
+
+    # Now that I have all the release files it's time to process the development files, with their creation dates.
+    rel_index = release_index(run['catalogs'][rel['name']]) # Each lookup is a constant time (or an indexed query)
+
+    # Files > MAX_DAYS and are NOT in the release catalog AND are NOT in the SKIP LISTSs can be deleted
+    for entries in batches:
+        for (dev_file, stamp) in entries:   # Loop through the development files
+            lprint ('Processing: %s' % dev_file, False, DEBUG)
+            file_name = dev_file.split('/')[-1] # Just the file with no path
+
+            # When we search for the file_name in the release catalog we have to take into account that the file name
+            # might be common in multiple paths, which we don't want. The easiest way
+            # for that search is to merely change the key's path from "npm-dev" to "npm-release". If that key
+            # exists in the release_catalog, we know not to remove it from the dev_catalog
+
+            # Convert the dev key to a possible release key
+            rel_to_chk = rel['path'] + dev_file[len(dev['path']):]
+
+            # See if our new key matches ANY entries in the list of release keys
+            match = release_match(rel_index, rel_to_chk, dev_file)
+            if match == 'path':
+                lprint ('    -> "%s" is listed in release catalog and will be kept' % file_name, False)
+                yield ('in_release', dev_file)  # Add to list of files ALSO found in the release repo
+            elif match == 'prefix':
+                # A release key starts with our key but is not our key. It would be very odd, but better to be safe
+                # than sorry.
+                lprint ('    -> "%s" is listed in release catalog and will be kept' % file_name, False)
+                lprint('ERROR: Could not verify key (%s)' % rel_to_chk, False)
+                yield ('skipped', dev_file)     # Err on the side of caution and dont delete the file.
+            elif match == 'package':
+                lprint ('    -> "%s" package version is in release catalog and will be kept' % file_name, False)
+                yield ('in_release', dev_file)
+            else:
+                days = engine.file_age(stamp)
+
+                if days > engine.MAX_DAYS:
+                    lprint ('  -> file is not in releases, is %d days old (%d is cutoff) .. marked for removal' % (days, engine.MAX_DAYS), False)
+                    yield ('delete', dev_file)  # Put this file in the delete list
+                else:
+                    lprint ('  -> file is not in releases, but only %d days old (%d is cutoff) .. file kept' % (days, engine.MAX_DAYS), False)
+                    yield ('keep', dev_file)    # Files NOT in release repo but too yuong
@@ -0,0 +1,185 @@
+# This module MUST be used with python 2.x
+#
+# bh-snapshots policy (REL-12265); a *-SNAPSHOT folder is deleted once neither it nor anything in it has changed in
+# MAX_DAYS (or, with DELETE_BY_FILE, each file older than that).
+
+import os
+from artifactory_cleaner import engine
+from artifactory_cleaner.engine import lprint, DEBUG
+
+NAME   = 'snapshots'
+GROUPS = True       # A SNAPSHOT folder can only be decided once all of its files are in
+LISTS  = ['keep', 'delete', 'skipped']
+LIST_FILES = dict()
+COUNTS = [('keep', 'kept (Too young)'), ('delete', 'to delete')]
+
+SNAPSHOT_REPO = 'bh-snapshots'
+
+# Max number of files to collect. As of May 2020 were over 725,000 files; give the option to limit that
+# setting to zero means no limit. A cap leaves an arbitrary slice of the repo, so SHARD_FOLDERS is the way to bound a run.
+MAX_FILES_TO_COLLECT = 0       # By default there is no limit. Jenkins may set to something else
+
+# Crawl this many top level folders (groups) a run, starting after the one the last run ended with (see
+# engine.shard_select), so every group is covered over a few runs. Zero crawls them all.
+SHARD_FOLDERS = 10      # : CLI and Jenkins
+PRUNE_FOLDERS = True    # Delete whole *-SNAPSHOT folders instead of file by file : CLI and Jenkins (DELETE_BY_FILE)
+
+# Skip the following FOLDERS in the bh-snapshots repo
+# This list can be appended to via the CLI "-S <list,of,folders>" option (comma seperated) or, from Jenkins
+# by adding folders in "SKIP_FOLDERS"
+SKIP_FOLDERS = ['master-SNAPSHOT', 'development-SNAPSHOT', 'develop-SNAPSHOT', 'dev-SNAPSHOT']
+
+# Skip FILES in this list. For now I skip variants of "DO_NOT_DELETE" in the file name, and the file "maven-metadata.xml"
+# This list can only be modified here (for now).
+SKIP_FILES = ['DONOTDELETE', 'DO_NOT_DELETE', 'DONTDELETE', 'DONT_DELETE', 'maven-metadata.xml']
+
+# Skipped files that don't stop their SNAPSHOT folder from being deleted (they only make sense with the folder's artifacts)
+FOLDER_FILES = ['maven-metadata.xml']
+
+def parse_options():
+    """ Parse the bh-snapshots options that are set in the environment (from Jenkins) """
+
+    global MAX_FILES_TO_COLLECT, SHARD_FOLDERS, PRUNE_FOLDERS
+
+    tmp = os.getenv("SKIP_FOLDERS")             # Append new folders to skip to the default list
+    if tmp:
+        SKIP_FOLDERS.extend(tmp.split(','))     # Extend the list with comma sep string
+
+    tmp = os.getenv("MAX_FILES_TO_COLLECT")
+    if tmp:
+        MAX_FILES_TO_COLLECT = int(tmp)
+
+    tmp = os.getenv("SHARD_FOLDERS")            # Groups (top level folders) to crawl a run
+    if tmp:
+        SHARD_FOLDERS = int(tmp)
+
+    tmp = os.getenv("DELETE_BY_FILE")           # Delete file by file instead of whole SNAPSHOT folders
+    if tmp and tmp.lower() in ['true', '1']:
+        PRUNE_FOLDERS = False
+
+def log_options():
+    """ Log which bh-snapshots options were called """
+
+    lprint ('MAX_FILES: %d' % MAX_FILES_TO_COLLECT, False)
+    lprint ('SHARD_FOLDERS: %d' % SHARD_FOLDERS, False)
+    lprint ('PRUNE FOLDERS: %s' % PRUNE_FOLDERS, False)
+    lprint ('SKIP FILES: %s' % ', '.join(SKIP_FILES), False)
+    lprint ('SKIP FOLDERS: %s' % ', '.join(SKIP_FOLDERS), False)
+
+def repos():
+    """ The bh-snapshots repo we clean (there is nothing to check it against) """
+
+    return [engine.new_repo(SNAPSHOT_REPO, 'snap', skip_folders=SKIP_FOLDERS, skip_files=SKIP_FILES,
+                            folder_files=FOLDER_FILES, shard=SHARD_FOLDERS, max_files=MAX_FILES_TO_COLLECT)]
+
+def list_header(kind):
+    """ The header lines of the bh-snapshots list files """
+
+    if kind == 'keep':
+        return ["These files are < %d days old (will be kept)" % engine.MAX_DAYS]
+    elif kind == 'delete':
+        return ["These files are marked for deletion because they are not in a skip lists and are > %d days old" % engine.MAX_DAYS]
+
+    return None
+
+def hold_folders(repo, held, seen):
+    """ Add the SNAPSHOT folders holding the skipped entries of <repo> after the first <seen> to <held>, and return how
+        many have been seen now. The skipped list only grows, so each entry is looked at once, however many batches
+        there are.
+
+        A folder holding something we skipped (other than FOLDER_FILES) can't be deleted as a whole, so its files
+        are kept as files (and handled one by one, like files that are not in a SNAPSHOT folder).
+    """
+
+    skipped = repo['skipped'][seen:]
+    for msg in skipped:
+        (kind, uri) = msg.split(': ', 1)
+        if kind == 'Skip File' and uri.split('/')[-1] in FOLDER_FILES:
+            continue
+        if kind == 'Skip Folder':
+            folder = snapshot_folder(repo, uri)         # The SNAPSHOT folder a skipped folder is in (not the folder itself)
+        else:
+            folder = snapshot_folder(repo, uri + '/')   # A file, or a folder that needs attention, and everything in it
+        if folder is not None:
+            held.add(folder)
+
+    return seen + len(skipped)
+
+def folder_ages(repo, ages, held):
+    """ Roll the file <ages> up to the *-SNAPSHOT folder each file is in; a folder is as old as its youngest file, and
+        is deleted with one request. Returns a dict of folder (with a trailing '/') and file ages. A SNAPSHOT folder
+        inside another is rolled up with the outer one, since deleting that deletes it too. The files of the <held>
+        folders (see hold_folders) are left as files.
+    """
+
+    rolled = dict()
+    back   = set()                                  # Held folders the files in <ages> are in
+    for (f, days) in ages.iteritems():
+        folder = snapshot_folder(repo, f)
+        if folder is None or folder in held:
+            rolled[f] = days
+            if folder is not None:
+                back.add(folder)
+        else:
+            rolled[folder] = min(days, rolled.get(folder, days))
+
+    folders = len([f for f in rolled if f.endswith('/')])
+    lprint ('%d files rolled up to %d SNAPSHOT folders (%d folders held back by skipped files)' %
+            (len(ages) - len(rolled) + folders, folders, len(back)), False)
+    return rolled
+
+def snapshot_folder(repo, uri):
+    """ Return the outermost *-SNAPSHOT folder (with a trailing '/') that <uri> is in, or None """
+
+    parts = uri[len(repo['path']):].split('/')[:-1]
+    for n in range(1, len(parts) + 1):
+        if parts[n - 1].endswith('-SNAPSHOT'):
+            return repo['path'] + '/'.join(parts[:n]) + '/'
+
+    return None
+
+def recheck(run, file):
+    """ Nothing to check a bh-snapshots delete candidate against but its own files (see engine.verify_folder) """
+
+    return None
+
+def classify(batches, run):
+    """ Pipeline stage: age the (file, timestamp) pairs of each batch of <batches> (a group, see engine.drain), rolling
+        them up to their SNAPSHOT folders unless deleting file by file, and yield (list kind, file or folder) as soon
+        as each is decided. The list kind is 'keep' or 'delete'.
+    """
+
+    repo  = run['target']
+    held  = set()                   # SNAPSHOT folders holding skipped files/folders (see hold_folders)
+    seen  = 0                       # Skipped entries already in <held>
+    prune = PRUNE_FOLDERS
+    if PRUNE_FOLDERS and not engine.GEN_SAVED_DATA:
+        lprint ('Saved data has no skipped files to hold folders back .. deleting file by file', False)
+        prune = False
+
+    for entries in batches:
+        ages = dict()
+        for (dev_file, stamp) in entries:
+            ages[dev_file] = engine.file_age(stamp)
+
+        # The goal is to delete a SNAPSHOT folder once neither it nor anything in it has changed in MAX_DAYS, so
+        # decide (and delete) per folder. That needs every file of the folder in the batch.
+        if prune and repo['max_shown']:
+            lprint ('MAX_FILES reached, the catalog may hold part of a SNAPSHOT folder .. deleting file by file', False)
+        elif prune:
+            seen = hold_folders(repo, held, seen)
+            ages = folder_ages(repo, ages, held)
+
+        # Now that I Have a list of files (or folders), with selected files/folders omitted, I can see if the lastMod
+        # date is > MAX_DAYS
+        for dev_file in sorted(ages):       # Loop through the development files/folders
+            lprint ('Processing: %s' % dev_file, False, DEBUG)
+            kind = 'folder' if dev_file.endswith('/') else 'file'
+            days = ages[dev_file]
+
+            if days > engine.MAX_DAYS:
+                lprint ('  -> %s is %d days old (%d is cutoff) .. marked for removal' % (kind, days, engine.MAX_DAYS), False)
+                yield ('delete', dev_file)  # File is ripe for picking .. put file in delete list
+            else:
+                lprint ('  -> %s is only %d days old (%d is cutoff) .. %s kept' % (kind, days, engine.MAX_DAYS, kind), False)
+                yield ('keep', dev_file)    # File is to young
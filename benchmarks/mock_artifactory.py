@@ -0,0 +1,299 @@
+# This script MUST be called with python 2.x
+#!/usr/bin/env python
+#
+# A stand-in for artifactory's storage API, serving synthetic npm-dev, npm-release and bh-snapshots repos, so the
+# cleaner can be run (and timed, see run_bench.py) without going near the real artifactory. It answers;
+#
+#   GET    /artifactory/api/storage/<repo><path>            folder (children) or file info (with an ETag; a 304
+#                                                           when it matches If-None-Match)
+#   GET    /artifactory/api/storage/<repo><path>?list&deep=1 file list API
+#   GET    /artifactory/<repo><path>                        the file itself (<size> bytes)
+#   HEAD   either of the above
+#   DELETE /artifactory/<repo><path>                        counted (the tree is never changed)
+#   POST   /artifactory/api/search/aql                      items.find() of the files of a repo created, modified
+#                                                           or updated after a date (what "-I" asks for)
+#   GET    /_stats                                          requests served, by method, and bytes sent
+#
+# With --capacity, a request arriving while that many are being answered gets a 429 (like a busy artifactory).
+#
+# python benchmarks/mock_artifactory.py --port 8081 --groups 20 --versions 5 --files 4 --depth 1 --latency 20
+
+import json
+import hashlib
+import time
+import random
+import bisect
+import argparse
+import datetime
+import threading
+import urllib
+import urlparse
+import BaseHTTPServer
+import SocketServer
+
+def make_trees(groups, versions, files, depth, max_age, seed):
+    """ Return {repo: {path: (timestamp, size)}} for the three repos. Each repo has <groups> top level folders, each
+        <depth> folders deep, holding <versions> version folders of <files> files. Ages are up to <max_age> days.
+    """
+
+    rnd = random.Random(seed)
+    now = datetime.datetime.utcnow()
+
+    def stamp():
+        return (now - datetime.timedelta(days=rnd.randint(0, max_age), seconds=rnd.randint(0, 86399))).strftime(
+            '%Y-%m-%dT%H:%M:%S.000+00:00')
+
+    nest = ''.join('/sub%d' % d for d in range(depth))     # The folders between a group and its versions
+
+    dev = dict()
+    for g in range(groups):
+        for v in range(versions):
+            for f in range(files):
+                dev['/pkg%d%s/-/pkg%d-%d.0.%d.tgz' % (g, nest, g, v, f)] = (stamp(), rnd.randint(1000, 5000000))
+        dev['/pkg%d/package.json' % g] = (stamp(), 2000)
+
+    release = dict()
+    for (k, v) in sorted(dev.items())[::3]:     # A third of npm-dev made it to npm-release
+        release[k] = v
+
+    snap = dict()
+    for g in range(groups):
+        for v in range(versions):
+            ver = 'master-SNAPSHOT' if v == 0 else '%d.0-SNAPSHOT' % v
+            folder = '/art%d%s/%s' % (g, nest, ver)
+            age = stamp()
+            for f in range(files):
+                snap['%s/art%d-%s-%d.jar' % (folder, g, ver, f)] = (age, rnd.randint(1000, 50000000))
+            snap[folder + '/maven-metadata.xml'] = (age, 800)
+
+    return {'npm-dev': dev, 'npm-release': release, 'bh-snapshots': snap}
+
+class Repo(object):
+    """ One repo's files, indexed for folder lookups and listings """
+
+    def __init__(self, files):
+        self.files   = files
+        self.paths   = sorted(files)
+        self.folders = dict()               # folder: {child: is_folder}
+        self.stamps  = dict()               # folder: lastModified (of its youngest file)
+        for (path, (ts, size)) in files.items():
+            parts = path.split('/')
+            for n in range(1, len(parts)):
+                folder = '/'.join(parts[:n]) or '/'
+                self.folders.setdefault(folder, dict())['/' + parts[n]] = n < len(parts) - 1
+                if ts > self.stamps.get(folder, ''):
+                    self.stamps[folder] = ts
+
+    def under(self, folder):
+        """ The paths of the files under <folder> """
+
+        prefix = '' if folder == '/' else folder + '/'
+        n = bisect.bisect_left(self.paths, prefix)
+        while n < len(self.paths) and self.paths[n].startswith(prefix):
+            yield self.paths[n]
+            n = n + 1
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Answers the storage API requests the cleaner sends """
+
+    protocol_version = 'HTTP/1.1'           # Keep-alive, like artifactory
+
+    def log_message(self, *args):
+        pass
+
+    def count(self, nbytes):
+        with self.server.lock:
+            stats = self.server.stats
+            stats['requests'][self.command] = stats['requests'].get(self.command, 0) + 1
+            stats['bytes'] = stats['bytes'] + nbytes
+
+    def reply(self, code, body, content_type='application/json', etag=False):
+        with self.server.lock:
+            busy = self.server.capacity > 0 and self.server.inflight >= self.server.capacity
+            if busy:
+                self.server.stats['busy'] = self.server.stats['busy'] + 1
+            else:
+                self.server.inflight = self.server.inflight + 1
+        if busy:                            # Turned away straight away
+            (code, body, content_type, etag) = (429, json.dumps({'errors': [{'status': 429}]}), 'application/json', False)
+        else:
+            try:
+                if self.server.latency > 0:
+                    time.sleep(self.server.latency)
+            finally:
+                with self.server.lock:
+                    self.server.inflight = self.server.inflight - 1
+        if etag:                            # Folder/file info; the client may already have this body
+            tag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get('If-None-Match') == tag:
+                (code, body) = (304, '')
+                with self.server.lock:
+                    self.server.stats['not_modified'] = self.server.stats['not_modified'] + 1
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', tag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+            self.count(len(body))
+        else:
+            self.count(0)
+
+    def not_found(self):
+        self.reply(404, json.dumps({'errors': [{'status': 404, 'message': 'Unable to find item'}]}))
+
+    def split(self):
+        """ Return (api, repo, path, query) of the request; api is 'storage', 'files' or None """
+
+        url   = urlparse.urlparse(self.path)
+        path  = urllib.unquote(url.path)
+        query = urlparse.parse_qs(url.query, keep_blank_values=True)
+        for (prefix, api) in [('/artifactory/api/storage/', 'storage'), ('/artifactory/', 'files')]:
+            if path.startswith(prefix):
+                (repo, sep, rest) = path[len(prefix):].partition('/')
+                return (api, repo, '/' + rest.strip('/') if rest.strip('/') else '/', query)
+        return (None, None, path, query)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if urlparse.urlparse(self.path).path != '/artifactory/api/search/aql':
+            return self.not_found()
+
+        # items.find({"repo": .., "type": "file", "$or": [{"created": {"$gt": date}}, ..]}).include(..)
+        try:
+            find  = json.loads(body[body.index('items.find(') + len('items.find('):body.index(').include(')])
+            since = min(c.values()[0]['$gt'] for c in find['$or'])
+        except (ValueError, KeyError, IndexError):
+            return self.reply(400, json.dumps({'errors': [{'status': 400, 'message': 'Bad AQL'}]}))
+        repo = self.server.repos.get(find.get('repo'))
+        if repo is None:
+            return self.reply(200, json.dumps({'results': [], 'range': {'total': 0}}))
+
+        since   = since[:19]                # Every date here is UTC, so the date and time sort as strings
+        results = list()
+        for p in repo.paths:
+            (ts, size) = repo.files[p]
+            if ts[:19] > since:
+                (path, sep, name) = p[1:].rpartition('/')
+                results.append({'repo': find['repo'], 'path': path or '.', 'name': name, 'created': ts,
+                                'modified': ts, 'size': size})
+        self.reply(200, json.dumps({'results': results, 'range': {'total': len(results)}}))
+
+    def do_DELETE(self):
+        (api, repo, path, query) = self.split()
+        if api != 'files' or repo not in self.server.repos:
+            return self.not_found()
+        with self.server.lock:
+            self.server.stats['deleted'] = self.server.stats['deleted'] + 1
+        self.reply(204, '')
+
+    def do_GET(self):
+        (api, name, path, query) = self.split()
+        if path == '/_stats':
+            with self.server.lock:
+                return self.reply(200, json.dumps(self.server.stats))
+
+        repo = self.server.repos.get(name)
+        if repo is None:
+            return self.not_found()
+        base = 'http://%s:%d/artifactory/api/storage/%s' % (self.server.server_address + (name,))
+        uri  = base + ('' if path == '/' else path)
+
+        if api == 'files':
+            if path not in repo.files:
+                return self.not_found()
+            return self.reply(200, 'x' * repo.files[path][1], 'application/octet-stream')
+
+        if 'list' in query:                 # File list API
+            if path not in repo.folders:
+                return self.not_found()
+            deep  = query.get('deep', ['0'])[0] == '1'
+            start = 0 if path == '/' else len(path)
+            files = list()
+            for p in repo.under(path):
+                rel = p[start:]
+                if not deep and rel.count('/') > 1:
+                    continue
+                (ts, size) = repo.files[p]
+                files.append({'uri': rel, 'size': size, 'lastModified': ts, 'folder': False})
+            return self.reply(200, json.dumps({'uri': uri, 'created': repo.stamps[path], 'files': files}))
+
+        if path in repo.files:
+            (ts, size) = repo.files[path]
+            return self.reply(200, json.dumps({'repo': name, 'path': path, 'created': ts, 'lastModified': ts,
+                                               'lastUpdated': ts, 'size': str(size), 'uri': uri,
+                                               'downloadUri': uri.replace('/api/storage', '')}), etag=True)
+        if path in repo.folders:
+            ts = repo.stamps[path]
+            children = [{'uri': c, 'folder': f} for (c, f) in sorted(repo.folders[path].items())]
+            return self.reply(200, json.dumps({'repo': name, 'path': path, 'created': ts, 'lastModified': ts,
+                                               'lastUpdated': ts, 'uri': uri, 'children': children}), etag=True)
+        return self.not_found()
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def start(trees, port=0, latency=0.0, capacity=0):
+    """ Serve <trees> (see make_trees) on <port> (0 picks a free one) from a background thread, answering each request
+        after <latency> seconds, and at most <capacity> (0 is no limit) at a time. Returns the server; its url is
+        server.url.
+    """
+
+    server = Server(('127.0.0.1', port), Handler)
+    server.repos   = dict((name, Repo(files)) for (name, files) in trees.items())
+    server.latency = latency
+    server.capacity = capacity
+    server.inflight = 0
+    server.lock    = threading.Lock()
+    server.stats   = {'requests': dict(), 'bytes': 0, 'deleted': 0, 'not_modified': 0, 'busy': 0}
+    server.url     = 'http://127.0.0.1:%d/artifactory/api/storage' % server.server_address[1]
+
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+
+    return server
+
+def reset(server):
+    """ Zero the server's request counts """
+
+    with server.lock:
+        server.stats = {'requests': dict(), 'bytes': 0, 'deleted': 0, 'not_modified': 0, 'busy': 0}
+
+def add_tree_options(parser):
+    """ The options that shape the synthetic repos (shared with run_bench.py) """
+
+    parser.add_argument('--groups', help='Top level folders in each repo (default 20)', type=int, default=20)
+    parser.add_argument('--versions', help='Version folders in each group (default 5)', type=int, default=5)
+    parser.add_argument('--files', help='Files in each version (default 4)', type=int, default=4)
+    parser.add_argument('--depth', help='Extra folder levels above the versions (default 1)', type=int, default=1)
+    parser.add_argument('--max_age', help='Oldest file, in days (default 120)', type=int, default=120)
+    parser.add_argument('--latency', help='Milliseconds to wait before answering a request (default 0)', type=float, default=0)
+    parser.add_argument('--capacity', help='Requests answered at a time; more get a 429 (default 0, no limit)', type=int, default=0)
+    parser.add_argument('--seed', help='Random seed (default 1)', type=int, default=1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock artifactory storage API')
+    parser.add_argument('--port', help='Port to listen on (default 8081)', type=int, default=8081)
+    add_tree_options(parser)
+    args = parser.parse_args()
+
+    trees  = make_trees(args.groups, args.versions, args.files, args.depth, args.max_age, args.seed)
+    server = start(trees, args.port, args.latency / 1000.0, args.capacity)
+    for (name, files) in sorted(trees.items()):
+        print '%-13s %7d files' % (name, len(files))
+    print 'Serving %s (Ctrl-C to stop)' % server.url
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
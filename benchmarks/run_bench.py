@@ -0,0 +1,110 @@
+# This script MUST be called with python 2.x
+#!/usr/bin/env python
+#
+# Time the cleaner against the stand-in artifactory (mock_artifactory.py) in each of its modes, so a change can be
+# measured on any Linux box instead of against the real artifactory for hours. Each mode is a fresh run of
+# "python -m artifactory_cleaner" (in its own folder) and gets its wall time, the requests the server answered (and a
+# second), the files cataloged (from the run's run_stats.json) and its peak memory.
+#
+# python benchmarks/run_bench.py --groups 50 --versions 10 --files 5 --latency 20 [--modes list,traverse] [--json out.json]
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import time
+import subprocess
+
+import mock_artifactory
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))     # The package is at the root of the repo
+
+# Each mode: (name, cleaner options, runs). Only the last run of a mode is timed (the ones before it set it up).
+MODES = [('list',        [],                 1),     # File list API (the default)
+         ('traverse',    ['-t'],             1),     # One request per folder/file
+         ('stream',      ['-P'],             1),     # Decide files as they are crawled
+         ('incremental', ['-I'],             2),     # Second run, nothing has changed
+         ('cache',       ['-t', '-K'],       2),     # Second crawl, with the HTTP cache of the first
+         ('sqlite',      ['-F', 'sqlite'],   1),     # SQLite catalogs
+         ('delete',      ['-D'],             1),     # Verify and delete the candidates
+         ('adaptive',    ['-t', '-Y'],       1),     # Requests in flight follow how the server copes (see --capacity)
+         ('dry_run',     ['-N', '-n'],       1),     # HEAD each candidate and project what would be freed
+         ('early',       ['-E', '-D'],       1)]     # Delete while crawling
+
+def run_mode(server, name, options, runs, args):
+    """ Run the cleaner <runs> times with <options> in a fresh folder. Returns the numbers of the last run. """
+
+    work = tempfile.mkdtemp(prefix='bench-%s-' % name)
+    env  = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    cmd  = [sys.executable, '-m', 'artifactory_cleaner', '-a', args.policies, '-u', 'bench', '-p', 'bench', '-k',
+            '-s', '0', '-A', server.url, '-W', str(args.workers), '-R', '0', '-L', 'warning'] + options
+
+    try:
+        for n in range(runs):
+            mock_artifactory.reset(server)
+            start = time.time()
+            with open(os.path.join(work, 'out.txt'), 'w') as out:
+                proc = subprocess.Popen(cmd, cwd=work, env=env, stdout=out, stderr=subprocess.STDOUT)
+                (pid, status, usage) = os.wait4(proc.pid, 0)        # wait4 gives us the child's own peak memory
+            wall = time.time() - start
+            if status != 0:
+                print '%s: the cleaner failed (see %s)' % (name, os.path.join(work, 'out.txt'))
+                return None
+
+        with open(os.path.join(work, 'run_stats.json')) as fi:
+            stats = json.load(fi)
+        requests = sum(server.stats['requests'].values())
+        result = {'mode': name, 'options': ' '.join(options), 'wall_secs': round(wall, 3), 'requests': requests,
+                  'requests_per_sec': round(requests / wall, 1), 'bytes': server.stats['bytes'],
+                  'deleted': server.stats['deleted'], 'not_modified': server.stats['not_modified'],
+                  'busy': server.stats['busy'], 'throttle': stats['http']['throttle'],
+                  'entries': stats['http']['entries'], 'cache': stats['http']['cache'],
+                  'peak_mb': round(usage.ru_maxrss / 1024.0, 1), 'phases': stats['phases']}
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the artifactory cleaner against a mock artifactory')
+    mock_artifactory.add_tree_options(parser)
+    parser.add_argument('--modes', help='Comma seperated modes to run (default all: %s)' % ','.join(m[0] for m in MODES), type=str)
+    parser.add_argument('--policies', help='Policies to run (default npm,snapshots)', type=str, default='npm,snapshots')
+    parser.add_argument('--workers', help='Cleaner workers (default 8)', type=int, default=8)
+    parser.add_argument('--json', help='Also save the results to this file', type=str)
+    parser.add_argument('--keep', help='Keep the folders the runs were done in', action='store_true')
+    args = parser.parse_args()
+
+    modes = MODES
+    if args.modes:
+        names = args.modes.split(',')
+        modes = [m for m in MODES if m[0] in names]
+
+    trees  = mock_artifactory.make_trees(args.groups, args.versions, args.files, args.depth, args.max_age, args.seed)
+    server = mock_artifactory.start(trees, 0, args.latency / 1000.0, args.capacity)
+    print 'Mock artifactory at %s; %s' % (server.url, ', '.join('%s %d files' % (k, len(v)) for (k, v) in sorted(trees.items())))
+    print 'Latency %g ms, capacity %d, %d workers\n' % (args.latency, args.capacity, args.workers)
+
+    print '%-12s %9s %9s %9s %9s %9s %9s' % ('mode', 'wall s', 'requests', 'req/s', 'files', 'deleted', 'peak MB')
+    results = list()
+    for (name, options, runs) in modes:
+        result = run_mode(server, name, options, runs, args)
+        if result is None:
+            continue
+        results.append(result)
+        print '%-12s %9.2f %9d %9.1f %9d %9d %9.1f' % (name, result['wall_secs'], result['requests'],
+              result['requests_per_sec'], result['entries'], result['deleted'], result['peak_mb'])
+        sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w') as fo:
+            json.dump({'groups': args.groups, 'versions': args.versions, 'files': args.files, 'depth': args.depth,
+                       'latency_ms': args.latency, 'workers': args.workers, 'results': results}, fo, indent=2)
+            fo.write('\n')
+
+if __name__ == '__main__':
+    main()